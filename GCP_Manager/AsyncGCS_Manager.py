@@ -0,0 +1,143 @@
+from GCP_Manager.GCS_Manager import GCS_Manager, TRANSFER_RESULT, TRANSFER_FAILURE, _PYTHON, _with_retry # type: ignore
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+import os
+import time
+
+# 同時進行的傳輸數量上限
+_DEFAULT_MAX_CONCURRENCY = 64
+
+class AsyncGCS_Manager:
+
+    """
+        GCS_Manager 的 asyncio 版本, 所有方法都是 awaitable, 可以在同一個 event loop 中和其他工作 (例如 DB) 重疊執行
+
+        ＊ 以 semaphore 限制同時進行的傳輸數量 (max_concurrency)
+        ＊ 資料夾傳輸會拆成每個檔案一個 task; 取消 (cancel) 時尚未開始的檔案不會再傳輸, 已在傳輸中的檔案會傳完
+        ＊ 其他參數 (max_workers, retries, sliced_threshold ...) 會直接傳給 GCS_Manager
+
+        Usage:
+            1. 建構 manager = AsyncGCS_Manager(bucket_name=Bucket 名稱, max_concurrency=64)
+            2. 下載檔案 await manager.download_file(remote_file=遠端路徑, local_file=本地路徑)
+            3. 上傳檔案 await manager.upload_file(local_file=本地路徑, remote_file=遠端路徑)
+            4. 下載資料夾 await manager.download_folder(remote_folder=遠端路徑, local_folder=本地路徑)
+            5. 上傳資料夾 await manager.upload_folder(local_folder=本地路徑, remote_folder=遠端路徑)
+            6. 檢查存在 await manager.check_file_exists(remote_path=遠端路徑) / await manager.check_folder_exists(remote_folder=遠端路徑)
+            7. 刪除 await manager.delete_remote_file(remote_file=遠端路徑) / await manager.delete_remote_folder(remote_folder=遠端路徑)
+            8. 結束時 await manager.close(), 或使用 async with AsyncGCS_Manager(...) as manager
+    """
+
+    def __init__(self, bucket_name, max_concurrency=_DEFAULT_MAX_CONCURRENCY, **gcs_kwargs):
+        """ 建構式 """
+        self.manager = GCS_Manager(bucket_name, **gcs_kwargs)
+        self.max_concurrency = max_concurrency
+
+        # 專用的 thread pool, 不佔用 event loop 預設的 executor
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """ 關閉 thread pool """
+        self._executor.shutdown(wait=False)
+
+    async def _run(self, func, *args, **kwargs):
+        """ 在 thread pool 中執行 blocking 函式, 受 semaphore 限制 """
+        # semaphore 需要在 event loop 中建立
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def download_file(self, remote_file, local_file, mode=_PYTHON):
+        """ 下載單個檔案 """
+        return await self._run(self.manager.download_file, remote_file, local_file, mode=mode)
+
+    async def upload_file(self, local_file, remote_file, mode=_PYTHON):
+        """ 上傳單個檔案 """
+        return await self._run(self.manager.upload_file, local_file, remote_file, mode=mode)
+
+    async def download_folder(self, remote_folder, local_folder, mode=_PYTHON, retries=None):
+        """ 下載整個資料夾, python mode 回傳 TRANSFER_RESULT """
+        if mode != _PYTHON:
+            return await self._run(self.manager.download_folder, remote_folder, local_folder, mode=mode)
+
+        blobs = await self._run(lambda: list(self.manager.list_prefix(remote_folder)))
+        tasks = []
+        for blob in blobs:
+            if blob.name.endswith("/"):
+                continue
+            local_file_path = os.path.join(local_folder, blob.name)
+            tasks.append((blob.name, local_file_path, self.manager._download_task(blob, local_file_path)))
+
+        result = await self._gather_transfers(tasks, retries)
+        print(f" --> [下載資料夾] \n --> 遠端資料夾：{remote_folder} \n --> 下載到：{local_folder} \n --> 成功 {len(result.succeeded)} 個, 失敗 {len(result.failed)} 個, 共 {result.bytes_transferred} bytes, 耗時 {result.elapsed:.2f} 秒 \n")
+        return result
+
+    async def upload_folder(self, local_folder, remote_folder, mode=_PYTHON, retries=None):
+        """ 上傳整個資料夾, python mode 回傳 TRANSFER_RESULT """
+        if mode != _PYTHON:
+            return await self._run(self.manager.upload_folder, local_folder, remote_folder, mode=mode)
+
+        def collect_files():
+            files = []
+            for root, _, file_names in os.walk(local_folder):
+                for file_name in file_names:
+                    local_file_path = os.path.join(root, file_name)
+                    relative_path = os.path.relpath(local_file_path, local_folder)
+                    files.append((local_file_path, os.path.join(remote_folder, relative_path)))
+            return files
+
+        files = await self._run(collect_files)
+        tasks = [(local_file_path, blob_name, self.manager._upload_task(local_file_path, blob_name)) for local_file_path, blob_name in files]
+
+        try:
+            result = await self._gather_transfers(tasks, retries)
+        finally:
+            self.manager._invalidate_listing(remote_folder)
+        print(f" --> [上傳資料夾] \n --> 本地資料夾：{local_folder} \n --> 上傳到：{remote_folder} \n --> 成功 {len(result.succeeded)} 個, 失敗 {len(result.failed)} 個, 共 {result.bytes_transferred} bytes, 耗時 {result.elapsed:.2f} 秒 \n")
+        return result
+
+    async def check_file_exists(self, remote_path):
+        """ 檢查遠端檔案是否存在 """
+        return await self._run(self.manager.check_file_exists, remote_path)
+
+    async def check_folder_exists(self, remote_folder):
+        """ 檢查遠端資料夾是否存在 """
+        return await self._run(self.manager.check_folder_exists, remote_folder)
+
+    async def delete_remote_file(self, remote_file, mode=_PYTHON):
+        """ 刪除遠端檔案 """
+        return await self._run(self.manager.delete_remote_file, remote_file, mode=mode)
+
+    async def delete_remote_folder(self, remote_folder, mode=_PYTHON):
+        """ 刪除遠端資料夾 (python mode 以 batch request 刪除) """
+        return await self._run(self.manager.delete_remote_folder, remote_folder, mode=mode)
+
+    async def _gather_transfers(self, tasks, retries=None):
+        """ 每個檔案一個 asyncio task 平行傳輸, 取消時一併取消尚未開始的檔案 """
+        retries = self.manager.retries if retries is None else retries
+        result = TRANSFER_RESULT()
+        start_time = time.monotonic()
+
+        outcomes = await asyncio.gather(*[self._run(_with_retry, task, retries) for _, _, task in tasks])
+        for (source, destination, _), (n_bytes, error, attempts) in zip(tasks, outcomes):
+            if error is None:
+                result.succeeded.append(destination)
+                result.bytes_transferred += n_bytes
+            else:
+                print(f" --> [傳輸失敗] \n --> 來源：{source} \n --> 目的：{destination} \n --> 錯誤：{error} \n")
+                result.failed.append(TRANSFER_FAILURE(source, destination, str(error), attempts))
+
+        result.elapsed = time.monotonic() - start_time
+        return result
+
+if __name__ == "__main__":
+    help(AsyncGCS_Manager)
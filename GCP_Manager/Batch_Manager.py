@@ -0,0 +1,188 @@
+from GCP_Manager.CRL_Manager import CRL_Manager, CLI_STREAM_CONFIG # type: ignore
+from GCP_Manager.Metrics_Manager import Metrics_Manager # type: ignore
+from GCP_Manager.Checkpoint_Manager import Checkpoint_Manager # type: ignore
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, asdict
+from typing import Iterable, Iterator, List, Tuple, Union
+import json
+import os
+import re
+import threading
+import time
+
+# 同時執行的任務數量和共用的傳輸 thread 數量
+_DEFAULT_MAX_JOBS = 4
+_DEFAULT_TRANSFER_WORKERS = 16
+
+# job_id 會成為工作資料夾名稱, 只允許英數字開頭的英數字、'.'、'_'、'-'
+_JOB_ID_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]*$')
+
+@dataclass
+class JOB_STATUS:
+    job_id: str
+    work_dir: str
+    success: bool = False
+    elapsed: float = 0.0
+    bytes_downloaded: int = 0
+    bytes_uploaded: int = 0
+    error: str = ""
+
+    def __bool__(self):
+        """ 任務成功才算成功 """
+        return self.success
+
+class Batch_Manager:
+
+    """
+        在同一台機器上平行執行多個 JOB_CONFIG (同一份 CLI 腳本), 取代大量的小型 Cloud Run 執行
+
+        ＊ 每個任務有自己的工作資料夾 (base_dir/job_id), 相對的 local_path 和 CLI 都在工作資料夾中
+        ＊ 最多 max_jobs 個任務同時執行 CLI, 最多 max_active_jobs 個任務同時進行 (預設 max_jobs 的兩倍),
+          任務在下載或上傳時不佔用 CLI 的名額; 所有任務共用 transfer_workers 個傳輸 thread 和 GCS client
+        ＊ 任務設定可以是 JSON 字串、dict 的 list, 或 JSONL 檔案 (一行一個任務, 逐行讀取);
+          設定中的 "job_id" 會作為任務名稱, 沒有時依序命名為 job-00000, job-00001 ...;
+          job_id 不合法 (例如包含 '/' 或 '..') 或重複時, 該任務不執行並記錄為失敗
+        ＊ checkpoint=True 時每個任務有自己的 manifest (工作資料夾中的 checkpoint.json, 指定 checkpoint_gcs_prefix 時也存到 GCS)
+        ＊ 每個任務的 CLI 輸出寫到工作資料夾中的 cli.log, 不直接輸出到 stdout (避免互相穿插)
+        ＊ 每個任務結束時寫一行 JOB_STATUS 到 status_path (JSONL), run() 回傳所有任務的 JOB_STATUS
+
+        Usage:
+            1. 建構 batch = Batch_Manager(script_content=CLI 腳本內容, base_dir=工作資料夾, max_jobs=4)
+            2. 執行 statuses = batch.run(jobs=任務設定的 list 或 JSONL 檔案路徑)
+            3. 印出結果 batch.print_summary(statuses)
+            4. 其他參數 (cache_dir, upload_mode ...) 會直接傳給每個任務的 CRL_Manager
+    """
+
+    def __init__(self, script_content: str, base_dir: str, max_jobs: int = _DEFAULT_MAX_JOBS,
+                 transfer_workers: int = _DEFAULT_TRANSFER_WORKERS, pipelined: bool = False,
+                 status_path: str = None, metrics_jsonl_path: str = None, max_active_jobs: int = None,
+                 checkpoint: bool = False, checkpoint_gcs_prefix: str = None, **crl_kwargs):
+        """ 建構式 """
+        if not isinstance(checkpoint, bool):
+            raise ValueError("checkpoint 不能在多個任務間共用, 請使用 checkpoint=True (每個任務各自的 manifest)")
+        for name in ("metrics", "work_dir", "transfer_pool", "cli_slots"):
+            if name in crl_kwargs:
+                raise ValueError(f"{name} 由 Batch_Manager 為每個任務設定, 不能指定")
+        self.script_content = script_content
+        self.base_dir = base_dir
+        self.max_jobs = max_jobs
+        self.max_active_jobs = max(max_jobs, max_active_jobs or max_jobs * 2)
+        self.transfer_workers = transfer_workers
+        self.pipelined = pipelined
+        self.status_path = status_path
+        self.metrics_jsonl_path = metrics_jsonl_path
+        self.checkpoint = checkpoint
+        self.checkpoint_gcs_prefix = checkpoint_gcs_prefix
+        self.crl_kwargs = crl_kwargs
+        self._status_lock = threading.Lock()
+        os.makedirs(base_dir, exist_ok=True)
+
+    @staticmethod
+    def load_jobs(jobs: Union[str, Iterable[Union[str, dict]]]) -> Iterator[Tuple[str, str]]:
+        """ 逐一讀取任務設定, 產生 (job_id, JSON 字串) """
+        if isinstance(jobs, str):
+            jobs = _iter_jsonl(jobs)
+        for index, job in enumerate(jobs):
+            if isinstance(job, str):
+                job = json.loads(job)
+            job_id = str(job.get("job_id", f"job-{index:05d}"))
+            yield job_id, json.dumps(job)
+
+    def run(self, jobs: Union[str, Iterable[Union[str, dict]]]) -> List[JOB_STATUS]:
+        """ 平行執行所有任務, 回傳每個任務的 JOB_STATUS (依照輸入順序) """
+        start_time = time.monotonic()
+        futures = []
+        seen_ids = set()
+        cli_slots = threading.Semaphore(self.max_jobs)
+        with ThreadPoolExecutor(max_workers=self.transfer_workers) as transfer_pool, \
+             ThreadPoolExecutor(max_workers=self.max_active_jobs) as job_pool:
+            pending = set()
+            for job_id, job_config in self.load_jobs(jobs):
+                error = _job_id_error(job_id, seen_ids)
+                seen_ids.add(job_id)
+                if error:
+                    future = Future()
+                    future.set_result(self._reject_job(job_id, error))
+                    futures.append(future)
+                    continue
+                # 只預先讀取有限的任務, JSONL 很大時不會全部讀進記憶體
+                if len(pending) >= self.max_active_jobs * 2:
+                    _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                future = job_pool.submit(self._run_job, job_id, job_config, transfer_pool, cli_slots)
+                futures.append(future)
+                pending.add(future)
+            results = [future.result() for future in futures]
+
+        succeeded = sum(1 for status in results if status)
+        print(f" --> [批次執行] 成功 {succeeded} 個, 失敗 {len(results) - succeeded} 個, 耗時 {time.monotonic() - start_time:.2f} 秒")
+        return results
+
+    def _run_job(self, job_id: str, job_config: str, transfer_pool: ThreadPoolExecutor, cli_slots: threading.Semaphore) -> JOB_STATUS:
+        """ 執行單一任務, 不拋出例外 """
+        work_dir = os.path.join(self.base_dir, job_id)
+        status = JOB_STATUS(job_id=job_id, work_dir=work_dir)
+        start_time = time.monotonic()
+        print(f" --> [批次執行] 開始 {job_id}")
+        try:
+            crl_kwargs = dict(self.crl_kwargs)
+            crl_kwargs.setdefault("cli_stream", CLI_STREAM_CONFIG(echo=False, log_file=os.path.join(work_dir, "cli.log")))
+            if self.checkpoint:
+                gcs_uri = f"{self.checkpoint_gcs_prefix.rstrip('/')}/{job_id}.json" if self.checkpoint_gcs_prefix else None
+                crl_kwargs["checkpoint"] = Checkpoint_Manager(os.path.join(work_dir, "checkpoint.json"), gcs_uri=gcs_uri)
+            metrics = Metrics_Manager(jsonl_path=self.metrics_jsonl_path, job_id=job_id)
+            crl_manager = CRL_Manager(job_config, self.script_content, metrics=metrics, work_dir=work_dir,
+                                      transfer_pool=transfer_pool, cli_slots=cli_slots, **crl_kwargs)
+            status.success = crl_manager.process_data(pipelined=self.pipelined)
+            summary = metrics.summary()
+            status.bytes_downloaded = summary["bytes_downloaded"]
+            status.bytes_uploaded = summary["bytes_uploaded"]
+            if not status.success:
+                status.error = "分析流程失敗, 請查看 log"
+        except Exception as e:
+            status.success = False
+            status.error = str(e)
+        status.elapsed = time.monotonic() - start_time
+        print(f" --> [批次執行] 結束 {job_id}: {'成功' if status.success else '失敗 ' + status.error}, 耗時 {status.elapsed:.2f} 秒")
+        self._write_status(status)
+        return status
+
+    def _reject_job(self, job_id: str, error: str) -> JOB_STATUS:
+        """ 不執行的任務 (job_id 不合法或重複), 記錄為失敗 """
+        status = JOB_STATUS(job_id=job_id, work_dir="", error=error)
+        print(f" --> [批次執行] 略過 {job_id}: {error}")
+        self._write_status(status)
+        return status
+
+    def _write_status(self, status: JOB_STATUS):
+        """ 寫一行任務狀態到 status_path """
+        if not self.status_path:
+            return
+        with self._status_lock:
+            with open(self.status_path, 'a') as file:
+                file.write(json.dumps(asdict(status), ensure_ascii=False) + "\n")
+
+    @staticmethod
+    def print_summary(statuses: List[JOB_STATUS]):
+        """ 印出每個任務的結果 """
+        print(" --> 批次執行結果：")
+        for status in statuses:
+            result = "成功" if status.success else f"失敗 ({status.error})"
+            print(f" ＊ {status.job_id}: {result}, {status.elapsed:.2f} 秒, 下載 {status.bytes_downloaded} bytes, 上傳 {status.bytes_uploaded} bytes")
+
+def _job_id_error(job_id: str, seen_ids: set):
+    """ 檢查 job_id 可以作為工作資料夾名稱且沒有重複, 回傳錯誤訊息 (沒有錯誤時為空字串) """
+    if not _JOB_ID_PATTERN.match(job_id):
+        return f"job_id 不合法 ({job_id!r}), 只能包含英數字、'.'、'_'、'-' 且以英數字開頭"
+    if job_id in seen_ids:
+        return f"job_id 重複 ({job_id!r})"
+    return ""
+
+def _iter_jsonl(path: str):
+    """ 逐行讀取 JSONL 檔案, 略過空行 """
+    with open(path, 'r') as file:
+        for line in file:
+            if line.strip():
+                yield line
+
+if __name__ == "__main__":
+    help(Batch_Manager)
@@ -1,10 +1,40 @@
-from GCP_Manager.GCS_Manager import GCS_Manager # type: ignore
-from dataclasses import dataclass
-from typing import List
+from GCP_Manager.GCS_Manager import GCS_Manager, _with_retry # type: ignore
+from GCP_Manager.Cache_Manager import Cache_Manager # type: ignore
+from GCP_Manager.Checkpoint_Manager import Checkpoint_Manager # type: ignore
+from GCP_Manager.Metrics_Manager import Metrics_Manager # type: ignore
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Dict, List, Tuple
 import json
 import os
 import re
 import subprocess  # 新增 subprocess 模組
+import sys
+import threading
+import time
+
+# pipelined 模式下檢查輸出檔案的間隔 (秒)
+_WATCH_INTERVAL = 5.0
+
+# 輸入/輸出平行傳輸設定
+_DEFAULT_TRANSFER_WORKERS = 8
+_DEFAULT_TRANSFER_RETRIES = 2
+
+# 傳輸方向 (metrics 用英文, 訊息用中文)
+_DOWNLOAD = "download"
+_UPLOAD = "upload"
+_DIRECTION_NAMES = {_DOWNLOAD: "下載", _UPLOAD: "上傳"}
+# checkpoint manifest 中記錄的種類
+_CHECKPOINT_KINDS = {_DOWNLOAD: "inputs", _UPLOAD: "outputs"}
+
+# 串流 CLI 輸出時每次讀取的大小
+_STREAM_READ_SIZE = 64 * 1024
+
+# CLI 腳本參數: $數字 或 ${數字}
+_PARAM_PATTERN = re.compile(r'\$(?:\{(\d+)\}|(\d+))')
+# 快取編譯後的 CLI 腳本數量 (批次執行時同一份腳本只解析一次)
+_TEMPLATE_CACHE_SIZE = 128
 
 @dataclass
 class FILETYPE:
@@ -16,6 +46,13 @@ class TRANSFER_METHOD:
     CLI = "command_line"
     API = "python"
 
+@dataclass
+class UPLOAD_MODE:
+    # 先刪除遠端舊的輸出再全部重新上傳
+    REPLACE = "replace"
+    # 只上傳 checksum 不同的檔案, 以 generation 為條件覆寫, 並刪除遠端多出來的檔案
+    SYNC = "sync"
+
 @dataclass
 class FILES_IO:
     # Remote
@@ -27,6 +64,61 @@ class FILES_IO:
     file_type: FILETYPE
     # Transfer method
     transfer_method: TRANSFER_METHOD
+    # pipelined 模式: 輸入為 False 時不必等它下載完就可以開始執行 CLI
+    required: bool = True
+
+@dataclass
+class ENTRY_REPORT:
+    entry: FILES_IO
+    success: bool
+    elapsed: float
+    bytes_transferred: int
+    attempts: int
+    error: str = ""
+
+@dataclass
+class TRANSFER_REPORT:
+    entries: List[ENTRY_REPORT] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def failed(self):
+        """ 失敗的項目 """
+        return [entry for entry in self.entries if not entry.success]
+
+    @property
+    def bytes_transferred(self):
+        """ 所有項目傳輸的 bytes """
+        return sum(entry.bytes_transferred for entry in self.entries)
+
+    def __bool__(self):
+        """ 所有項目都成功才算成功 """
+        return len(self.failed) == 0
+
+@dataclass
+class CLI_STREAM_CONFIG:
+    # 保留 stdout / stderr 最後幾個 bytes, 用於錯誤回報
+    tail_bytes: int = 64 * 1024
+    # 同時輸出到 container 的 stdout / stderr
+    echo: bool = True
+    # 寫到本地 log 檔, 超過 log_max_bytes 時輪替, 保留 log_backup_count 個舊檔
+    log_file: str = None
+    log_max_bytes: int = 100 * 1024 * 1024
+    log_backup_count: int = 3
+    # 直接串流上傳到 GCS, 例如 gs://bucket/logs/job.log
+    log_gcs_uri: str = None
+
+@dataclass
+class CLI_RESULT:
+    returncode: int
+    elapsed: float
+    stdout_tail: str = ""
+    stderr_tail: str = ""
+    error: str = ""
+
+    def __bool__(self):
+        """ 退出碼為 0 才算成功 """
+        return self.returncode == 0 and not self.error
 
 @dataclass
 class JOB_CONFIG:
@@ -49,17 +141,82 @@ class CRL_Manager():
             2. 在 JOB_Config.conf 中設定 inputs, outputs, cli_script_path, cli_params
             3. 建立實體 crl_manager = CRL_Manager("JOB_Config.conf")
             4. 執行 crl_manager.process_data(), 依照 config 的設定下載資料 -> 執行 CLI -> 上傳結果
+
+        ＊ process_data(pipelined=True): 平行下載所有輸入, 必要 (required) 的輸入到齊就開始執行 CLI,
+          CLI 執行中會先上傳已完成 (大小和修改時間不再變動) 的輸出, CLI 結束後再上傳剩下的輸出;
+          輸入設定 "required": false 時不必等它下載完。注意 CLI 失敗時可能已經有部分輸出上傳到 GCS
+        ＊ download_data / upload_results 以 transfer_workers 個 thread 平行處理每個 FILES_IO, 單一檔案各自重試 transfer_retries 次
+          (資料夾由 GCS_Manager 逐檔重試失敗的檔案, 不會整個資料夾重傳),
+          回傳 TRANSFER_REPORT (每項的成功與否、耗時、bytes、錯誤), 也會存在 last_download_report / last_upload_report
+        ＊ 各階段耗時、每個 FILES_IO 的傳輸量、CLI 的 CPU 時間和 peak RSS 會記錄到 metrics (Metrics_Manager),
+          可輸出成 JSON lines 或透過 hook 送到其他系統
+        ＊ 指定 cli_stream (CLI_STREAM_CONFIG) 時, CLI 的 stdout / stderr 會分段讀取, 只保留最後 tail_bytes 在記憶體,
+          可同時寫到輪替的本地 log 檔或直接串流到 GCS; execute_CLI 回傳 CLI_RESULT (退出碼、耗時、log 結尾)
+        ＊ upload_mode=UPLOAD_MODE.SYNC 時, python mode 的輸出只上傳 checksum (crc32c/md5) 與遠端不同的檔案,
+          以 generation 為條件直接覆寫 (不先刪除, 上傳期間遠端輸出不會消失), 資料夾中遠端多出來的檔案會在最後刪除;
+          command_line mode 的輸出仍是先刪除再上傳
+        ＊ 指定 work_dir 時, 相對的 local_path 會放在 work_dir 底下, CLI 也在 work_dir 中執行 (同一台機器跑多個任務時互不干擾);
+          指定 transfer_pool 時, 每個 FILES_IO 的傳輸改用共用的 thread pool; 指定 cli_slots (Semaphore) 時, 執行 CLI 前需取得一個 slot
+        ＊ 指定 checkpoint (Checkpoint_Manager) 時, 進度會記錄在 manifest (本地, 也可以存到 GCS); 中斷後以相同設定、
+          相同的輸入 generation 在同一個 execution 中重跑時, 已上傳完成的任務直接結束, 本地檔案仍在且 checksum 相同的輸入、
+          CLI 輸出和已上傳的輸出會略過 (sequential 和 pipelined 流程都適用)
+        ＊ 指定 cache_dir 時, python mode 的輸入檔案會經過本地快取 (Cache_Manager), 同一台機器上重複使用的檔案不再重新下載
     """
 
-    def __init__(self, job_config_data: str, script_content: str, debug: bool = False):
+    def __init__(self, job_config_data: str, script_content: str, debug: bool = False,
+                 cache_dir: str = None, cache_max_bytes: int = None, cache_link_mode: str = "hardlink",
+                 transfer_workers: int = _DEFAULT_TRANSFER_WORKERS, transfer_retries: int = _DEFAULT_TRANSFER_RETRIES,
+                 metrics: Metrics_Manager = None, cli_stream: CLI_STREAM_CONFIG = None,
+                 upload_mode: str = UPLOAD_MODE.REPLACE, work_dir: str = None, transfer_pool: ThreadPoolExecutor = None,
+                 checkpoint: Checkpoint_Manager = None, cli_slots: threading.Semaphore = None):
         """ 建構式 """
 
+        # 限制同時執行的 CLI 數量 (例如 Batch_Manager 多個任務共用), None 時不限制
+        self.cli_slots = cli_slots
+
+        # 中斷後重跑時略過已完成的工作
+        self.checkpoint = checkpoint
+
+        # 工作資料夾: 相對的 local_path 放在 work_dir 底下, CLI 也在 work_dir 中執行
+        self.work_dir = work_dir
+        if work_dir is not None:
+            os.makedirs(work_dir, exist_ok=True)
+
+        # 共用的傳輸 thread pool (例如 Batch_Manager 多個任務共用), None 時每次傳輸各自建立
+        self.transfer_pool = transfer_pool
+
+        # 輸出上傳方式
+        if upload_mode not in (UPLOAD_MODE.REPLACE, UPLOAD_MODE.SYNC):
+            raise ValueError(f"upload_mode 需要是 {UPLOAD_MODE.REPLACE} 或 {UPLOAD_MODE.SYNC}, 但提供 {upload_mode}")
+        self.upload_mode = upload_mode
+
+        # CLI 輸出串流設定, None 時 CLI 直接輸出到 container 的 stdout / stderr
+        self.cli_stream = cli_stream
+
+        # 各階段耗時、傳輸量、CLI 資源用量
+        self.metrics = metrics if metrics is not None else Metrics_Manager()
+
+        # 輸入/輸出平行傳輸設定和最近一次的傳輸報告
+        self.transfer_workers = transfer_workers
+        self.transfer_retries = transfer_retries
+        self.last_download_report = None
+        self.last_upload_report = None
+
+        # 輸入檔案的本地快取
+        self.cache = None
+        if cache_dir is not None:
+            cache_kwargs = {"link_mode": cache_link_mode}
+            if cache_max_bytes is not None:
+                cache_kwargs["max_bytes"] = cache_max_bytes
+            self.cache = Cache_Manager(cache_dir, **cache_kwargs)
+
         self.debug = debug
         if self.debug:
             print(" --> 開啟 debug mode")
             return
 
         # Parse job config data from JSON string
+        job_config_content = job_config_data
         job_config_data = json.loads(job_config_data)
 
         # Convert job config data to JOB_CONFIG dataclass
@@ -72,6 +229,9 @@ class CRL_Manager():
         # Handle input and output files
         self.input_files = self.job_config.inputs
         self.output_files = self.job_config.outputs
+        if self.work_dir is not None:
+            for files_io in self.input_files + self.output_files:
+                files_io.local_path = os.path.join(self.work_dir, files_io.local_path)
 
         # CLI script content
         self.cli_script_content = script_content
@@ -79,115 +239,664 @@ class CRL_Manager():
         # CLI params
         self.cli_params = self.job_config.cli_params
 
+        # 讀取同一個任務 (設定、腳本和輸入的 generation 都相同) 的進度
+        if self.checkpoint is not None:
+            self.checkpoint.bind(Checkpoint_Manager.run_key(job_config_content, script_content, self._input_generations()))
+
+    def _input_generations(self):
+        """ 輸入在 GCS 上的 generation, 輸入被更新時 checkpoint 會視為不同的任務 """
+        generations = []
+        for input_file in self.input_files:
+            gcs_manager = GCS_Manager(input_file.gcs_bucket)
+            if input_file.file_type == FILETYPE.FOLDER:
+                prefix = input_file.gcs_path.rstrip("/") + "/"
+                generations.extend(f"gs://{input_file.gcs_bucket}/{blob.name}#{blob.generation}" for blob in gcs_manager.list_prefix(prefix))
+            else:
+                blob = gcs_manager.bucket.get_blob(input_file.gcs_path)
+                generations.append(f"gs://{input_file.gcs_bucket}/{input_file.gcs_path}#{blob.generation if blob is not None else None}")
+        return "\n".join(generations)
+
     def download_data(self, input_files: List[FILES_IO]):
         """ 下載資料 """
         print(f" --> 下載資料...{len(input_files)} 個")
-        try:
-            for input_file in input_files:
-                gcs_manager = GCS_Manager(input_file.gcs_bucket)
-                # 如果是資料夾, 下載資料夾
-                if input_file.file_type == FILETYPE.FOLDER:
-                    gcs_manager.download_folder(input_file.gcs_path, input_file.local_path, mode=input_file.transfer_method)
-                # 如果是檔案, 下載檔案
-                elif input_file.file_type == FILETYPE.FILE:
-                    gcs_manager.download_file(input_file.gcs_path, input_file.local_path, mode=input_file.transfer_method)
-            return True
-        except Exception as e:
-            print(f"下載資料失敗: {e}")
-            return False
-    
+        report = self._transfer_entries(self._download_entry, input_files, _DOWNLOAD)
+        self.last_download_report = report
+        for entry_report in report.failed:
+            print(f"下載資料失敗: {entry_report.entry.gcs_path} {entry_report.error}")
+        return report
+
+    def _download_entry(self, input_file: FILES_IO):
+        """ 下載單一輸入, 回傳傳輸的 bytes, 失敗時拋出例外 """
+        gcs_manager = GCS_Manager(input_file.gcs_bucket)
+        use_cache = self.cache is not None and input_file.transfer_method == TRANSFER_METHOD.API
+        # 經過快取下載
+        if use_cache and input_file.file_type == FILETYPE.FOLDER:
+            result = self.cache.fetch_folder(gcs_manager, input_file.gcs_path, input_file.local_path)
+            if not result:
+                raise RuntimeError(f"{input_file.gcs_path} 有 {len(result.failed)} 個檔案下載失敗")
+            return result.bytes_transferred
+        elif use_cache and input_file.file_type == FILETYPE.FILE:
+            return self.cache.fetch_file(gcs_manager, input_file.gcs_path, input_file.local_path)
+        # 如果是資料夾, 下載資料夾
+        elif input_file.file_type == FILETYPE.FOLDER:
+            result = gcs_manager.download_folder(input_file.gcs_path, input_file.local_path, mode=input_file.transfer_method)
+            if result is not None and not result:
+                raise RuntimeError(f"{input_file.gcs_path} 有 {len(result.failed)} 個檔案下載失敗")
+            return result.bytes_transferred if result is not None else _local_size(input_file.local_path)
+        # 如果是檔案, 下載檔案
+        elif input_file.file_type == FILETYPE.FILE:
+            gcs_manager.download_file(input_file.gcs_path, input_file.local_path, mode=input_file.transfer_method)
+            return _local_size(input_file.local_path)
+        return 0
+
+    def _transfer_entries(self, transfer: Callable[[FILES_IO], int], entries: List[FILES_IO], direction: str):
+        """ 以 thread pool 平行傳輸每個 FILES_IO, 回傳 TRANSFER_REPORT """
+        report = TRANSFER_REPORT()
+        start_time = time.monotonic()
+        if entries and self.transfer_pool is not None:
+            report.entries = list(self.transfer_pool.map(lambda entry: self._transfer_entry(transfer, entry, direction), entries))
+        elif entries:
+            with ThreadPoolExecutor(max_workers=max(1, min(self.transfer_workers, len(entries)))) as executor:
+                report.entries = list(executor.map(lambda entry: self._transfer_entry(transfer, entry, direction), entries))
+        report.elapsed = time.monotonic() - start_time
+        print(f" --> [{_DIRECTION_NAMES[direction]}報告] 成功 {len(report.entries) - len(report.failed)} 個, 失敗 {len(report.failed)} 個, 共 {report.bytes_transferred} bytes, 耗時 {report.elapsed:.2f} 秒")
+        return report
+
+    def _transfer_entry(self, transfer: Callable[[FILES_IO], int], entry: FILES_IO, direction: str):
+        """ 傳輸單一 FILES_IO 並重試, 回傳 ENTRY_REPORT """
+        if self.checkpoint is not None and self.checkpoint.entry_done(_CHECKPOINT_KINDS[direction], _entry_key(entry), entry.local_path):
+            print(f" --> [checkpoint] gs://{entry.gcs_bucket}/{entry.gcs_path} 已{_DIRECTION_NAMES[direction]}且驗證, 略過")
+            return ENTRY_REPORT(entry=entry, success=True, elapsed=0.0, bytes_transferred=0, attempts=0)
+
+        start_time = time.monotonic()
+        # 資料夾在 GCS_Manager / Cache_Manager 中已經逐檔重試, 整個資料夾不再重傳, 只有單一檔案在這裡重試
+        retries = self.transfer_retries if entry.file_type == FILETYPE.FILE else 0
+        n_bytes, error, attempts = _with_retry(lambda: transfer(entry), retries)
+        entry_report = ENTRY_REPORT(
+            entry=entry,
+            success=error is None,
+            elapsed=time.monotonic() - start_time,
+            bytes_transferred=n_bytes or 0,
+            attempts=attempts,
+            error="" if error is None else str(error),
+        )
+        self.metrics.transfer(
+            direction, f"gs://{entry.gcs_bucket}/{entry.gcs_path}", entry.local_path,
+            entry_report.bytes_transferred, entry_report.elapsed, entry_report.success, attempts,
+        )
+        if self.checkpoint is not None and entry_report.success:
+            self.checkpoint.mark_entry(_CHECKPOINT_KINDS[direction], _entry_key(entry), entry.local_path)
+        status = "成功" if entry_report.success else f"失敗 ({entry_report.error})"
+        print(f" --> [{_DIRECTION_NAMES[direction]}報告] gs://{entry.gcs_bucket}/{entry.gcs_path}: {status}, {entry_report.elapsed:.2f} 秒, {entry_report.bytes_transferred} bytes, 嘗試 {attempts} 次")
+        return entry_report
+
     def parse_cli_script(self, cli_script_content: str):
         """ 解析 CLI 腳本 """
         print(" --> 解析 CLI 腳本...")
 
-        # 找出有幾個參數(使用正則表達式找出所有以 $數字 結尾的行)
-        param_count = 0
-        for line in cli_script_content.split('\n'):
-            matches = re.findall(r'\$\d+$|\${\d+}$', line)
-            if matches:
-                match_num = matches[0][1:]
-                if '{' in match_num:
-                    match_num = match_num.replace('{', '')
-                    match_num = match_num.replace('}', '')
-                param_count = max(param_count, int(match_num))
-
-        # 檢查 CLI 腳本參數數量是否正確
-        if param_count != len(self.cli_params):
-            raise ValueError(f"CLI 腳本參數數量不正確, 應為 {param_count}, 但提供 {len(self.cli_params)} 個參數")
-
-        # 將 CLI 腳本中的參數替換成實際的參數
-        for i in range(param_count):
-            cli_script_content = cli_script_content.replace(f"${i+1}", self.cli_params[i])
-            if (i+1) > 9:
-                cli_script_content = cli_script_content.replace(f"${{{i+1}}}", self.cli_params[i])
-        
-        return cli_script_content
-        
+        template = _compile_cli_template(cli_script_content)
+
+        # 檢查 CLI 腳本參數數量是否正確 (參數個數為以 $數字 或 ${數字} 結尾的行中最大的數字)
+        if template.param_count != len(self.cli_params):
+            message = f"CLI 腳本參數數量不正確, 應為 {template.param_count}, 但提供 {len(self.cli_params)} 個參數"
+            if template.param_count > len(self.cli_params):
+                message += f"; 缺少參數 {', '.join(f'${i}' for i in range(len(self.cli_params) + 1, template.param_count + 1))}"
+            else:
+                message += f"; 多出的參數 {self.cli_params[template.param_count:]}"
+            raise ValueError(message)
+
+        # 腳本中超過參數個數的 $數字 (例如 awk 的 $5) 不會被替換
+        unreplaced = sorted({index for index in template.params if index > template.param_count})
+        if unreplaced:
+            print(f" --> [解析 CLI 腳本] {', '.join(f'${i}' for i in unreplaced)} 超過參數個數, 不會被替換")
+
+        # 將 CLI 腳本中的參數一次替換成實際的參數
+        return template.render(self.cli_params)
+
     def execute_CLI(self, cli_commands: str):
         """ 執行 CLI 指令 """
         print(" --> 執行 CLI 指令...")
+        result = self._run_cli(cli_commands)
+        if result.error:
+            print(f"執行 CLI 指令失敗: {result.error}")
+        elif result.returncode != 0:
+            print(f"CLI 指令執行失敗，退出碼: {result.returncode}")
+            if result.stderr_tail:
+                print(f" --> [stderr 結尾]\n{result.stderr_tail}")
+        return result
+
+    def _run_cli(self, cli_commands: str):
+        """ 執行 CLI 並記錄 metrics, 回傳 CLI_RESULT; 指定 cli_slots 時先等待可用的 slot """
+        if self.cli_slots is None:
+            return self._run_cli_process(cli_commands)
+        with self.cli_slots:
+            return self._run_cli_process(cli_commands)
+
+    def _run_cli_process(self, cli_commands: str):
+        start_time = time.monotonic()
         try:
-            # 使用 subprocess.run 執行命令，shell=True 允許執行 shell 命令
-            result = subprocess.run(cli_commands, shell=True, check=False)
-            
-            # 檢查退出碼
-            if result.returncode != 0:
-                print(f"CLI 指令執行失敗，退出碼: {result.returncode}")
-                return False
-                
-            return True
+            if self.cli_stream is None:
+                # 使用 subprocess.Popen 執行命令，shell=True 允許執行 shell 命令
+                process = subprocess.Popen(cli_commands, shell=True, cwd=self.work_dir)
+                returncode = self.metrics.measure_cli(process, start_time)
+                return CLI_RESULT(returncode=returncode, elapsed=time.monotonic() - start_time)
+
+            streamer = _CLI_Streamer(self.cli_stream)
+            returncode = streamer.run(cli_commands, cwd=self.work_dir, wait=lambda process: self.metrics.measure_cli(process, start_time))
+            return CLI_RESULT(
+                returncode=returncode,
+                elapsed=time.monotonic() - start_time,
+                stdout_tail=streamer.tail("stdout"),
+                stderr_tail=streamer.tail("stderr"),
+                # log 寫入失敗時這個步驟也算失敗
+                error="; ".join(streamer.errors),
+            )
         except Exception as e:
-            print(f"執行 CLI 指令失敗: {e}")
-            return False
+            return CLI_RESULT(returncode=-1, elapsed=time.monotonic() - start_time, error=str(e))
 
     def upload_results(self, output_files: List[FILES_IO]):
         """ 上傳結果 """
         print(" --> 上傳結果...")
-        try:
-            for output_file in output_files:
-                gcs_manager = GCS_Manager(output_file.gcs_bucket)
-                # 如果是資料夾, 上傳資料夾
-                if output_file.file_type == FILETYPE.FOLDER:
-                    # 檢查 output_file 是否已經存在GCS上 如果存在先把它刪除
-                    if gcs_manager.check_folder_exists(output_file.gcs_path+"/"):
-                        gcs_manager.delete_remote_folder(output_file.gcs_path, mode=output_file.transfer_method)
-                    gcs_manager.upload_folder(output_file.local_path, output_file.gcs_path, mode=output_file.transfer_method)
-                # 如果是檔案, 上傳檔案
-                elif output_file.file_type == FILETYPE.FILE:
-                    # 檢查 output_file 是否已經存在GCS上 如果存在先把它刪除
-                    if gcs_manager.check_file_exists(output_file.gcs_path):
-                        gcs_manager.delete_remote_file(output_file.gcs_path, mode=output_file.transfer_method)
-                    gcs_manager.upload_file(output_file.local_path, output_file.gcs_path, mode=output_file.transfer_method)
-            return True
-        except Exception as e:
-            print(f"上傳結果失敗: {e}")
-            return False
+        report = self._transfer_entries(self._upload_entry, output_files, _UPLOAD)
+        self.last_upload_report = report
+        for entry_report in report.failed:
+            print(f"上傳結果失敗: {entry_report.entry.local_path} {entry_report.error}")
+        return report
+
+    def _upload_entry(self, output_file: FILES_IO):
+        """ 上傳單一輸出, 回傳傳輸的 bytes, 失敗時拋出例外 """
+        gcs_manager = GCS_Manager(output_file.gcs_bucket)
+        if self._sync_output(output_file):
+            return self._sync_entry(gcs_manager, output_file)
+        # 檢查 output_file 是否已經存在GCS上 如果存在先把它刪除
+        self._clear_remote_output(gcs_manager, output_file)
+        # 如果是資料夾, 上傳資料夾
+        if output_file.file_type == FILETYPE.FOLDER:
+            result = gcs_manager.upload_folder(output_file.local_path, output_file.gcs_path, mode=output_file.transfer_method)
+            if result is not None and not result:
+                raise RuntimeError(f"{output_file.local_path} 有 {len(result.failed)} 個檔案上傳失敗")
+            return result.bytes_transferred if result is not None else _local_size(output_file.local_path)
+        # 如果是檔案, 上傳檔案
+        elif output_file.file_type == FILETYPE.FILE:
+            gcs_manager.upload_file(output_file.local_path, output_file.gcs_path, mode=output_file.transfer_method)
+            return _local_size(output_file.local_path)
+        return 0
+
+    def _sync_output(self, output_file: FILES_IO):
+        """ 是否以 sync 方式上傳這個輸出 """
+        return self.upload_mode == UPLOAD_MODE.SYNC and output_file.transfer_method == TRANSFER_METHOD.API
+
+    def _sync_entry(self, gcs_manager: GCS_Manager, output_file: FILES_IO):
+        """ 只上傳有變動的檔案, 回傳傳輸的 bytes, 失敗時拋出例外 """
+        if output_file.file_type == FILETYPE.FOLDER:
+            result = gcs_manager.sync_up(output_file.local_path, output_file.gcs_path, delete_extraneous=True)
+        elif output_file.file_type == FILETYPE.FILE:
+            result = gcs_manager.sync_file_up(output_file.local_path, output_file.gcs_path)
+        else:
+            return 0
+        if not result:
+            raise RuntimeError(f"{output_file.local_path} 有 {len(result.failed)} 個檔案上傳失敗: {result.failed[0].error}")
+        return result.bytes_transferred
 
-    def process_data(self):
+    def _clear_remote_output(self, gcs_manager: GCS_Manager, output_file: FILES_IO):
+        """ 刪除 GCS 上已存在的輸出, 有檔案刪除失敗時拋出例外 (避免舊的輸出和新的輸出混在一起) """
+        if output_file.file_type == FILETYPE.FOLDER:
+            if gcs_manager.check_folder_exists(output_file.gcs_path+"/"):
+                result = gcs_manager.delete_remote_folder(output_file.gcs_path, mode=output_file.transfer_method)
+                # command line 模式沒有回傳結果
+                if result is not None and not result:
+                    raise RuntimeError(f"{output_file.gcs_path} 有 {len(result.failed)} 個舊檔案刪除失敗: {result.failed[0].error}")
+        elif output_file.file_type == FILETYPE.FILE:
+            if gcs_manager.check_file_exists(output_file.gcs_path):
+                gcs_manager.delete_remote_file(output_file.gcs_path, mode=output_file.transfer_method)
+
+    def process_data(self, pipelined: bool = False, watch_interval: float = _WATCH_INTERVAL):
         """ 跑分析流程 """
 
         print(" --> 開始跑分析流程...")
 
+        if self.checkpoint is not None and self.checkpoint.stage_done("upload"):
+            print(" --> [checkpoint] 這個任務已經完成, 略過")
+            return True
+
+        with self.metrics.stage("run", pipelined=pipelined) as run_info:
+            if pipelined:
+                success = self._process_data_pipelined(watch_interval)
+            else:
+                success = self._process_data_sequential()
+            run_info["success"] = success
+        return success
+
+    def _process_data_sequential(self):
+        """ 依序: 下載 -> 執行 CLI -> 上傳 """
+
         # step1: download data
-        if not self.download_data(self.input_files):
+        with self.metrics.stage("download") as stage_info:
+            stage_info["success"] = bool(self.download_data(self.input_files))
+        if not stage_info["success"]:
             print("下載資料失敗, 分析流程結束")
-            return
+            return False
+        self._checkpoint_stage("download")
 
         # step2: parse CLI script
-        cli_commands = self.parse_cli_script(self.cli_script_content)
+        with self.metrics.stage("parse"):
+            cli_commands = self.parse_cli_script(self.cli_script_content)
         print(" --> 運行指令: \n", cli_commands)
 
-        # step3: execute CLI
-        if not self.execute_CLI(cli_commands):
-            print("執行 CLI 指令失敗, 分析流程結束")
-            return
+        # step3: execute CLI (上次已執行完且輸出都還在時略過)
+        if self._execute_done():
+            print(" --> [checkpoint] CLI 已執行完成且輸出相同, 略過")
+        else:
+            with self.metrics.stage("execute") as stage_info:
+                stage_info["success"] = bool(self.execute_CLI(cli_commands))
+            if not stage_info["success"]:
+                print("執行 CLI 指令失敗, 分析流程結束")
+                return False
+            self._checkpoint_products()
 
         # step4: upload results
-        if not self.upload_results(self.output_files):
+        with self.metrics.stage("upload") as stage_info:
+            stage_info["success"] = bool(self.upload_results(self.output_files))
+        if not stage_info["success"]:
             print("上傳結果失敗, 分析流程結束")
-            return
+            return False
+        self._checkpoint_stage("upload")
+
+        print(" --> 分析流程完成！")
+        return True
+
+    def _checkpoint_stage(self, stage: str):
+        """ 記錄階段完成 """
+        if self.checkpoint is not None:
+            self.checkpoint.mark_stage(stage)
+
+    def _checkpoint_products(self):
+        """ 記錄 CLI 的輸出 (products) 和 execute 階段完成 """
+        if self.checkpoint is not None:
+            for output_file in self.output_files:
+                self.checkpoint.mark_entry("products", _entry_key(output_file), output_file.local_path)
+        self._checkpoint_stage("execute")
+
+    def _execute_done(self):
+        """ CLI 是否已執行完成, 且每個輸出的本地檔案與當時相同 """
+        if self.checkpoint is None or not self.checkpoint.stage_done("execute"):
+            return False
+        return all(self.checkpoint.entry_done("products", _entry_key(output_file), output_file.local_path) for output_file in self.output_files)
+
+    def _process_data_pipelined(self, watch_interval: float):
+        """ pipelined 流程: 平行下載輸入 -> 必要輸入到齊就執行 CLI -> 執行中上傳已完成的輸出 """
+
+        # step1: parse CLI script (不需要等輸入)
+        with self.metrics.stage("parse"):
+            cli_commands = self.parse_cli_script(self.cli_script_content)
+        print(" --> 運行指令: \n", cli_commands)
+
+        # step2: 平行下載所有輸入, 等必要 (required) 的輸入完成
+        print(f" --> 平行下載資料...{len(self.input_files)} 個")
+        if self.transfer_pool is not None:
+            download_pool = self.transfer_pool
+        else:
+            download_pool = ThreadPoolExecutor(max_workers=max(1, min(self.transfer_workers, len(self.input_files))))
+        try:
+            with self.metrics.stage("download") as stage_info:
+                futures = {download_pool.submit(self._transfer_entry, self._download_entry, input_file, _DOWNLOAD): input_file for input_file in self.input_files}
+                required = [future for future, input_file in futures.items() if input_file.required]
+                wait(required)
+                stage_info["success"] = all(future.result().success for future in required)
+            if not stage_info["success"]:
+                print("下載資料失敗, 分析流程結束")
+                return False
+
+            # 上次 CLI 已執行完且輸出都還在: 等輸入下載完後只上傳還沒上傳的輸出
+            if self._execute_done():
+                print(" --> [checkpoint] CLI 已執行完成且輸出相同, 略過")
+                return self._resume_upload(futures)
+
+            # step3: 先清除遠端舊的輸出, 再一邊執行 CLI 一邊上傳已完成的輸出
+            try:
+                for output_file in self.output_files:
+                    if not self._sync_output(output_file):
+                        self._clear_remote_output(GCS_Manager(output_file.gcs_bucket), output_file)
+            except Exception as e:
+                print(f"上傳結果失敗: {e}")
+                print("上傳結果失敗, 分析流程結束")
+                return False
+
+            print(" --> 執行 CLI 指令...")
+            watcher = _Output_Watcher(self.output_files, watch_interval, self.metrics, self.upload_mode)
+            watcher.start()
+            with self.metrics.stage("execute") as stage_info:
+                try:
+                    cli_result = self._run_cli(cli_commands)
+                finally:
+                    watcher.stop()
+                stage_info["success"] = bool(cli_result)
+
+            # 其餘 (非必要) 的輸入也必須下載成功
+            if not self._download_finished(futures):
+                return False
+        finally:
+            if download_pool is not self.transfer_pool:
+                download_pool.shutdown(wait=True)
+
+        if not cli_result:
+            print(f"CLI 指令執行失敗，退出碼: {cli_result.returncode} {cli_result.error}")
+            if cli_result.stderr_tail:
+                print(f" --> [stderr 結尾]\n{cli_result.stderr_tail}")
+            print("執行 CLI 指令失敗, 分析流程結束")
+            return False
+        self._checkpoint_products()
+
+        # step4: 上傳剩下 (或在 CLI 結束前又被修改) 的輸出
+        print(" --> 上傳結果...")
+        with self.metrics.stage("upload") as stage_info:
+            try:
+                watcher.upload_remaining()
+            except Exception as e:
+                stage_info["success"] = False
+                print(f"上傳結果失敗: {e}")
+        if not stage_info["success"]:
+            print("上傳結果失敗, 分析流程結束")
+            return False
+        if self.checkpoint is not None:
+            for output_file in self.output_files:
+                self.checkpoint.mark_entry("outputs", _entry_key(output_file), output_file.local_path)
+        self._checkpoint_stage("upload")
 
         print(" --> 分析流程完成！")
+        return True
+
+    def _download_finished(self, futures):
+        """ 等所有輸入下載完成並記錄報告和 checkpoint, 全部成功時回傳 True """
+        self.last_download_report = TRANSFER_REPORT(entries=[future.result() for future in futures])
+        if not self.last_download_report:
+            print("下載資料失敗, 分析流程結束")
+            return False
+        self._checkpoint_stage("download")
+        return True
+
+    def _resume_upload(self, futures):
+        """ pipelined 流程從 checkpoint 接續: CLI 已執行完成, 以一般方式上傳還沒上傳的輸出 """
+        if not self._download_finished(futures):
+            return False
+        with self.metrics.stage("upload") as stage_info:
+            stage_info["success"] = bool(self.upload_results(self.output_files))
+        if not stage_info["success"]:
+            print("上傳結果失敗, 分析流程結束")
+            return False
+        self._checkpoint_stage("upload")
+        print(" --> 分析流程完成！")
+        return True
+
+@dataclass(frozen=True)
+class _CLI_Template:
+    """ 編譯後的 CLI 腳本: 文字片段和參數交錯 (literals 比 params 多一個) """
+    literals: Tuple[str, ...]
+    params: Tuple[int, ...]
+    tokens: Tuple[str, ...]
+    param_count: int
+
+    def render(self, cli_params: List[str]):
+        """ 一次替換所有參數, $0 和超過參數個數的保留原樣 """
+        pieces = [self.literals[0]]
+        for index, token, literal in zip(self.params, self.tokens, self.literals[1:]):
+            pieces.append(cli_params[index - 1] if 0 < index <= len(cli_params) else token)
+            pieces.append(literal)
+        return "".join(pieces)
+
+@lru_cache(maxsize=_TEMPLATE_CACHE_SIZE)
+def _compile_cli_template(cli_script_content: str):
+    """ 掃描一次 CLI 腳本, 找出所有 $N / ${N} (N 可以是多位數, $10 是第 10 個參數) """
+    literals, params, tokens = [], [], []
+    param_count = 0
+    position = 0
+    for match in _PARAM_PATTERN.finditer(cli_script_content):
+        index = int(match.group(1) or match.group(2))
+        literals.append(cli_script_content[position:match.start()])
+        params.append(index)
+        tokens.append(match.group(0))
+        position = match.end()
+        # 參數個數只看位於行尾的參數
+        if position == len(cli_script_content) or cli_script_content[position] == '\n':
+            param_count = max(param_count, index)
+    literals.append(cli_script_content[position:])
+    return _CLI_Template(tuple(literals), tuple(params), tuple(tokens), param_count)
+
+def _entry_key(entry: FILES_IO):
+    """ FILES_IO 在 checkpoint manifest 中的 key """
+    return f"gs://{entry.gcs_bucket}/{entry.gcs_path} <-> {entry.local_path}"
+
+def _local_size(local_path: str):
+    """ 本地檔案或資料夾的大小 (bytes) """
+    if os.path.isfile(local_path):
+        return os.path.getsize(local_path)
+    total_size = 0
+    for root, _, files in os.walk(local_path):
+        for file_name in files:
+            total_size += os.path.getsize(os.path.join(root, file_name))
+    return total_size
+
+class _Rotating_Log:
+    """ 超過 max_bytes 時輪替的 log 檔 (log -> log.1 -> log.2 ...) """
+
+    def __init__(self, path: str, max_bytes: int, backup_count: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, 'ab')
+
+    def write(self, data: bytes):
+        if self._file.tell() + len(data) > self.max_bytes and self._file.tell() > 0:
+            self._rotate()
+        self._file.write(data)
+
+    def _rotate(self):
+        self._file.close()
+        for i in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        self._file = open(self.path, 'wb')
+
+    def close(self):
+        self._file.close()
+
+class _CLI_Streamer:
+    """ 分段讀取 CLI 的 stdout / stderr, 保留結尾並輸出到 echo / 本地 log / GCS, 記憶體用量固定 """
+
+    def __init__(self, config: CLI_STREAM_CONFIG):
+        self.config = config
+        self._tails = {"stdout": bytearray(), "stderr": bytearray()}
+        self._lock = threading.Lock()
+        self._sinks = []
+        # 寫入 log 或 echo 失敗的錯誤; 失敗的輸出會被停用, 但 pipe 會持續讀到結束, 避免 CLI 卡在寫入
+        self.errors = []
+
+    def run(self, cli_commands: str, cwd: str = None, wait: Callable[[subprocess.Popen], int] = None):
+        """ 執行 CLI 並串流輸出, 以 wait(process) (預設 process.wait) 等待結束, 回傳 returncode """
+        self._open_sinks()
+        try:
+            process = subprocess.Popen(cli_commands, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd)
+            readers = [
+                threading.Thread(target=self._pump, args=(process.stdout, "stdout", sys.stdout), daemon=True),
+                threading.Thread(target=self._pump, args=(process.stderr, "stderr", sys.stderr), daemon=True),
+            ]
+            for reader in readers:
+                reader.start()
+            returncode = wait(process) if wait is not None else process.wait()
+            for reader in readers:
+                reader.join()
+            return returncode
+        finally:
+            for sink in self._sinks:
+                self._close_sink(sink)
+
+    def tail(self, stream_name: str):
+        """ 回傳 stream 的結尾 (文字) """
+        with self._lock:
+            return bytes(self._tails[stream_name]).decode('utf-8', errors='replace')
+
+    def _open_sinks(self):
+        if self.config.log_file:
+            self._sinks.append(_Rotating_Log(self.config.log_file, self.config.log_max_bytes, self.config.log_backup_count))
+        if self.config.log_gcs_uri:
+            bucket_name, _, remote_file = self.config.log_gcs_uri.replace("gs://", "", 1).partition("/")
+            self._sinks.append(GCS_Manager(bucket_name).open_writer(remote_file))
+
+    def _pump(self, pipe, stream_name: str, echo_stream):
+        """ 持續讀取 pipe 直到結束; 輸出失敗時停用該輸出並繼續讀取 """
+        tail = self._tails[stream_name]
+        echo = self.config.echo
+        for chunk in iter(lambda: os.read(pipe.fileno(), _STREAM_READ_SIZE), b""):
+            with self._lock:
+                tail += chunk
+                if len(tail) > self.config.tail_bytes:
+                    del tail[:len(tail) - self.config.tail_bytes]
+                for sink in list(self._sinks):
+                    try:
+                        sink.write(chunk)
+                    except Exception as e:
+                        self._sinks.remove(sink)
+                        self.errors.append(f"寫入 CLI log 失敗: {e}")
+                        self._close_sink(sink)
+            if echo:
+                try:
+                    echo_stream.buffer.write(chunk)
+                    echo_stream.buffer.flush()
+                except Exception as e:
+                    echo = False
+                    with self._lock:
+                        self.errors.append(f"輸出 CLI {stream_name} 失敗: {e}")
+        pipe.close()
+
+    def _close_sink(self, sink):
+        """ 關閉輸出 (GCS 在關閉時才完成上傳), 失敗時記錄錯誤 """
+        try:
+            sink.close()
+        except Exception as e:
+            self.errors.append(f"關閉 CLI log 失敗: {e}")
+
+class _Output_Watcher(threading.Thread):
+    """ pipelined 模式下監看輸出檔案, 大小和修改時間在一個檢查間隔內沒有變動的檔案就先上傳 """
+
+    def __init__(self, output_files: List[FILES_IO], watch_interval: float, metrics: Metrics_Manager,
+                 upload_mode: str = UPLOAD_MODE.REPLACE):
+        super().__init__(daemon=True)
+        self.metrics = metrics
+        self.upload_mode = upload_mode
+        # 只有 python mode 的輸出可以逐檔上傳, command_line mode 的輸出在 CLI 結束後整批上傳
+        self.output_files = [output_file for output_file in output_files if output_file.transfer_method == TRANSFER_METHOD.API]
+        self.batch_outputs = [output_file for output_file in output_files if output_file.transfer_method != TRANSFER_METHOD.API]
+        self.watch_interval = watch_interval
+        self._stop_event = threading.Event()
+        self._last_seen: Dict[str, Tuple[int, int]] = {}
+        self._uploaded: Dict[str, Tuple[int, int]] = {}
+        # CLI 執行中已上傳的遠端檔案 (本地路徑 -> (output_file, 遠端路徑)), CLI 結束後用來刪除本地已不存在的檔案
+        self._uploaded_remote: Dict[str, Tuple[FILES_IO, str]] = {}
+
+    def run(self):
+        while not self._stop_event.wait(self.watch_interval):
+            try:
+                self._upload_stable_files()
+            except Exception as e:
+                # CLI 結束後會再檢查一次, 這裡只印出錯誤
+                print(f" --> [監看輸出] 上傳失敗, CLI 結束後會重試: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def upload_remaining(self):
+        """ CLI 結束後, 刪除上傳後本地又被刪除的檔案, 並上傳尚未上傳或上傳後又變動的檔案 """
+        self._delete_vanished()
+        for output_file, local_file, remote_file, signature in self._scan():
+            if self._uploaded.get(local_file) != signature:
+                self._upload(output_file, local_file, remote_file, signature)
+        for output_file in self.batch_outputs:
+            gcs_manager = GCS_Manager(output_file.gcs_bucket)
+            if output_file.file_type == FILETYPE.FOLDER:
+                gcs_manager.upload_folder(output_file.local_path, output_file.gcs_path, mode=output_file.transfer_method)
+            elif output_file.file_type == FILETYPE.FILE:
+                gcs_manager.upload_file(output_file.local_path, output_file.gcs_path, mode=output_file.transfer_method)
+        # 必須產生的單一檔案輸出
+        for output_file in self.output_files:
+            if output_file.file_type == FILETYPE.FILE and output_file.local_path not in self._uploaded:
+                raise FileNotFoundError(f"找不到輸出檔案 {output_file.local_path}")
+        # sync 模式沒有事先清除遠端, 刪除資料夾中這次沒有產生的舊檔案
+        if self.upload_mode == UPLOAD_MODE.SYNC:
+            self._delete_extraneous()
+
+    def _delete_vanished(self):
+        """ 刪除 CLI 執行中已上傳、但 CLI 結束時本地已不存在的檔案 (例如暫存檔), 讓遠端與循序模式一致 """
+        vanished: Dict[str, List[str]] = {}
+        for local_file, (output_file, remote_file) in list(self._uploaded_remote.items()):
+            if os.path.exists(local_file):
+                continue
+            vanished.setdefault(output_file.gcs_bucket, []).append(remote_file)
+            self._uploaded.pop(local_file, None)
+            del self._uploaded_remote[local_file]
+        for gcs_bucket, remote_files in vanished.items():
+            print(f" --> [監看輸出] 刪除 {len(remote_files)} 個本地已不存在的已上傳檔案")
+            result = GCS_Manager(gcs_bucket).delete_blobs(remote_files)
+            if not result:
+                raise RuntimeError(f"gs://{gcs_bucket} 有 {len(result.failed)} 個本地已不存在的已上傳檔案刪除失敗")
+
+    def _delete_extraneous(self):
+        produced = {remote_file for _, _, remote_file, _ in self._scan()}
+        for output_file in self.output_files:
+            if output_file.file_type != FILETYPE.FOLDER:
+                continue
+            gcs_manager = GCS_Manager(output_file.gcs_bucket)
+            prefix = output_file.gcs_path.rstrip("/") + "/"
+            extraneous = [blob.name for blob in gcs_manager.list_prefix(prefix) if not blob.name.endswith("/") and blob.name not in produced]
+            result = gcs_manager.delete_blobs(extraneous)
+            if not result:
+                raise RuntimeError(f"{output_file.gcs_path} 有 {len(result.failed)} 個舊檔案刪除失敗")
+
+    def _upload_stable_files(self):
+        seen = {}
+        for output_file, local_file, remote_file, signature in self._scan():
+            seen[local_file] = signature
+            # 與上一次檢查相同 (已穩定) 且還沒上傳過這個版本
+            if self._last_seen.get(local_file) == signature and self._uploaded.get(local_file) != signature:
+                self._upload(output_file, local_file, remote_file, signature)
+        self._last_seen = seen
+
+    def _upload(self, output_file: FILES_IO, local_file: str, remote_file: str, signature: Tuple[int, int]):
+        start_time = time.monotonic()
+        gcs_manager = GCS_Manager(output_file.gcs_bucket)
+        n_bytes = signature[0]
+        if self.upload_mode == UPLOAD_MODE.SYNC:
+            result = gcs_manager.sync_file_up(local_file, remote_file)
+            if not result:
+                raise RuntimeError(f"{local_file} 上傳失敗: {result.failed[0].error}")
+            n_bytes = result.bytes_transferred
+        else:
+            gcs_manager.upload_file(local_file, remote_file, mode=output_file.transfer_method)
+        self._uploaded[local_file] = signature
+        self._uploaded_remote[local_file] = (output_file, remote_file)
+        self.metrics.transfer(_UPLOAD, f"gs://{output_file.gcs_bucket}/{remote_file}", local_file, n_bytes, time.monotonic() - start_time, True)
+
+    def _scan(self):
+        """ 列出目前的輸出檔案 (output_file, 本地路徑, 遠端路徑, (大小, 修改時間)) """
+        for output_file in self.output_files:
+            if output_file.file_type == FILETYPE.FILE:
+                candidates = [(output_file.local_path, output_file.gcs_path)]
+            else:
+                candidates = []
+                for root, _, files in os.walk(output_file.local_path):
+                    for file_name in files:
+                        local_file = os.path.join(root, file_name)
+                        relative_path = os.path.relpath(local_file, output_file.local_path)
+                        candidates.append((local_file, os.path.join(output_file.gcs_path, relative_path)))
+            for local_file, remote_file in candidates:
+                try:
+                    stat = os.stat(local_file)
+                except FileNotFoundError:
+                    continue
+                yield output_file, local_file, remote_file, (stat.st_size, stat.st_mtime_ns)
 
 if __name__ == "__main__":
     help(CRL_Manager)
\ No newline at end of file
@@ -0,0 +1,221 @@
+import os
+import uuid
+import shutil
+import hashlib
+import threading
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:
+    # 非 POSIX 平台 (例如 Windows) 沒有 fcntl: 不使用 reflink, 淘汰時只在同一個 process 中上鎖
+    fcntl = None
+
+# 預設快取上限 (bytes)
+_DEFAULT_MAX_BYTES = 50 * 1024 ** 3
+
+# 放置快取檔案的方式
+_HARDLINK = 'hardlink'
+_REFLINK = 'reflink'
+_COPY = 'copy'
+
+# Linux ioctl FICLONE, 用於 reflink (btrfs / xfs 等支援 copy-on-write 的檔案系統)
+_FICLONE = 0x40049409
+
+# 沒有 fcntl 時使用的 process 內鎖
+_PROCESS_LOCK = threading.Lock()
+
+class Cache_Manager:
+
+    """
+        本地 blob 快取, 以 bucket、路徑和 generation/md5 為 key, 超過上限時以 LRU 淘汰
+
+        ＊ 命中快取時以 hardlink / reflink 放到目的路徑, 不經過網路
+        ＊ 多個 process 可以共用同一個快取資料夾 (寫入以 rename 完成, 淘汰時以 flock 上鎖)
+        ＊ hardlink 模式下請勿直接修改下載後的檔案, 會連同快取一起改到; 需要修改請用 link_mode='copy'
+
+        Usage:
+            1. 建構 cache = Cache_Manager(cache_dir=快取資料夾, max_bytes=快取上限, link_mode='hardlink'或'reflink'或'copy')
+            2. 下載檔案 cache.fetch_file(gcs_manager, remote_file=遠端路徑, local_file=本地路徑)
+            3. 下載資料夾 cache.fetch_folder(gcs_manager, remote_folder=遠端路徑, local_folder=本地路徑)
+            4. 清除快取 cache.clear()
+    """
+
+    def __init__(self, cache_dir, max_bytes=_DEFAULT_MAX_BYTES, link_mode=_HARDLINK):
+        """ 建構式 """
+        if link_mode not in (_HARDLINK, _REFLINK, _COPY):
+            raise ValueError(f"link_mode 需要是 {_HARDLINK}, {_REFLINK} 或 {_COPY}, 但提供 {link_mode}")
+
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.link_mode = link_mode
+
+        # 快取統計
+        self.hits = 0
+        self.misses = 0
+
+        self._objects_dir = os.path.join(cache_dir, "objects")
+        self._tmp_dir = os.path.join(cache_dir, "tmp")
+        self._lock_file = os.path.join(cache_dir, ".lock")
+        os.makedirs(self._objects_dir, exist_ok=True)
+        os.makedirs(self._tmp_dir, exist_ok=True)
+
+    @staticmethod
+    def cache_key(bucket_name, blob):
+        """ 以 bucket、路徑、generation 和 md5/crc32c 產生快取 key """
+        checksum = blob.md5_hash or blob.crc32c or ""
+        raw_key = f"{bucket_name}/{blob.name}#{blob.generation}#{checksum}"
+        return hashlib.sha256(raw_key.encode('utf-8')).hexdigest()
+
+    def fetch_file(self, gcs_manager, remote_file, local_file):
+        """ 透過快取下載單個檔案, 回傳檔案大小 """
+        blob = gcs_manager.bucket.get_blob(remote_file)
+        if blob is None:
+            raise FileNotFoundError(f"gs://{gcs_manager.bucket_name}/{remote_file} 不存在")
+        return self.fetch_blob(gcs_manager.bucket_name, blob, local_file)
+
+    def fetch_folder(self, gcs_manager, remote_folder, local_folder, max_workers=None, retries=None):
+        """ 透過快取下載整個資料夾 (與 GCS_Manager.download_folder 相同的本地路徑), 回傳 TRANSFER_RESULT """
+        tasks = []
+        for blob in gcs_manager.list_prefix(remote_folder):
+            if blob.name.endswith("/"):
+                continue
+            local_file_path = os.path.join(local_folder, blob.name)
+            tasks.append((blob.name, local_file_path, self._fetch_task(gcs_manager.bucket_name, blob, local_file_path)))
+        return gcs_manager._run_transfers(tasks, max_workers, retries)
+
+    def fetch_blob(self, bucket_name, blob, local_file):
+        """ 透過快取取得 blob 並放到 local_file, 回傳檔案大小 """
+        key = self.cache_key(bucket_name, blob)
+        cached_path = os.path.join(self._objects_dir, key)
+
+        # 命中快取: 更新使用時間並放到目的路徑, 若剛好被其他 process 淘汰則改為重新下載
+        if os.path.exists(cached_path):
+            try:
+                os.utime(cached_path)
+                self._place(cached_path, local_file)
+                self.hits += 1
+                print(f" --> [快取命中] \n --> 遠端檔案：{blob.name} \n --> 放到：{local_file} \n")
+                return os.path.getsize(local_file)
+            except FileNotFoundError:
+                pass
+
+        # 未命中: 先下載到暫存檔, 再以 rename 放入快取 (rename 是 atomic, 其他 process 不會讀到寫一半的檔案)
+        self.misses += 1
+        tmp_path = os.path.join(self._tmp_dir, f"{key}.{os.getpid()}.{uuid.uuid4().hex}")
+        try:
+            blob.download_to_filename(tmp_path, if_generation_match=blob.generation)
+            os.replace(tmp_path, cached_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        print(f" --> [下載到快取] \n --> 遠端檔案：{blob.name} \n --> 快取：{cached_path} \n")
+
+        self._place(cached_path, local_file)
+        self.evict(keep=key)
+        return os.path.getsize(local_file)
+
+    def evict(self, keep=None):
+        """ 快取超過上限時, 依照最後使用時間淘汰最舊的檔案 """
+        with self._locked():
+            entries = []
+            total_size = 0
+            for entry in os.scandir(self._objects_dir):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path, entry.name))
+                total_size += stat.st_size
+
+            if total_size <= self.max_bytes:
+                return
+
+            for _, size, path, name in sorted(entries):
+                if total_size <= self.max_bytes:
+                    break
+                if name == keep:
+                    continue
+                try:
+                    os.remove(path)
+                    total_size -= size
+                    print(f" --> [淘汰快取] {name}")
+                except FileNotFoundError:
+                    continue
+
+    def clear(self):
+        """ 清除所有快取 """
+        with self._locked():
+            for entry in os.scandir(self._objects_dir):
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    continue
+        print(f" --> [清除快取] {self.cache_dir}")
+
+    def print_cache_info(self):
+        """ 印出快取資訊 """
+        total_size = sum(entry.stat().st_size for entry in os.scandir(self._objects_dir))
+        print(" --> Blob 快取資訊：")
+        print(f" ＊ Cache dir: {self.cache_dir}")
+        print(f" ＊ Size: {total_size} / {self.max_bytes} bytes")
+        print(f" ＊ Hits: {self.hits}, Misses: {self.misses}")
+
+    def _fetch_task(self, bucket_name, blob, local_file_path):
+        """ 建立單一 blob 的快取下載工作 """
+        def task():
+            return self.fetch_blob(bucket_name, blob, local_file_path)
+        return task
+
+    def _place(self, cached_path, local_file):
+        """ 將快取檔案放到目的路徑: hardlink -> reflink -> copy """
+        os.makedirs(os.path.dirname(local_file) or ".", exist_ok=True)
+        if os.path.lexists(local_file):
+            os.remove(local_file)
+
+        if self.link_mode == _HARDLINK:
+            try:
+                os.link(cached_path, local_file)
+                return
+            except FileNotFoundError:
+                raise
+            except OSError:
+                # 跨檔案系統等情況無法 hardlink
+                pass
+
+        if self.link_mode in (_HARDLINK, _REFLINK):
+            try:
+                self._reflink(cached_path, local_file)
+                return
+            except FileNotFoundError:
+                raise
+            except OSError:
+                # 檔案系統不支援 reflink
+                if os.path.exists(local_file):
+                    os.remove(local_file)
+
+        shutil.copyfile(cached_path, local_file)
+
+    @staticmethod
+    def _reflink(src, dst):
+        """ 以 FICLONE 建立 copy-on-write 複本 """
+        if fcntl is None:
+            raise OSError("此平台不支援 reflink")
+        with open(src, 'rb') as src_file, open(dst, 'wb') as dst_file:
+            fcntl.ioctl(dst_file.fileno(), _FICLONE, src_file.fileno())
+
+    @contextmanager
+    def _locked(self):
+        """ 以 flock 鎖住快取資料夾, 避免多個 process 同時淘汰 """
+        if fcntl is None:
+            with _PROCESS_LOCK:
+                yield
+            return
+        with open(self._lock_file, 'a') as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+if __name__ == "__main__":
+    help(Cache_Manager)
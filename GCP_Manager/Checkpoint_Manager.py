@@ -0,0 +1,175 @@
+from GCP_Manager.GCS_Manager import GCS_Manager, _file_crc32c, _file_md5, google_crc32c # type: ignore
+from datetime import datetime
+from typing import Dict
+import hashlib
+import json
+import os
+import threading
+
+# manifest 格式版本, 格式不同時視為沒有 checkpoint
+_MANIFEST_VERSION = 1
+
+class Checkpoint_Manager:
+
+    """
+        記錄分析流程的進度 (run manifest), 讓中斷後重跑的任務略過已完成且驗證過的工作
+
+        ＊ manifest 記錄: 已完成的階段、已下載的輸入 (inputs)、CLI 產生的輸出 (products) 和已上傳的輸出 (outputs),
+          每個本地檔案都記錄大小和 crc32c/md5
+        ＊ manifest 存在本地 (manifest_path), 也可以同時存到 GCS (gcs_uri), Cloud Run 重試換了機器時仍可判斷哪些輸出已上傳
+        ＊ 以 JOB_CONFIG、CLI 腳本內容、輸入在 GCS 上的 generation 和執行識別 (execution_id) 的 hash 辨識任務,
+          任何一項不同時會重新開始; execution_id 預設為 Cloud Run 的 CLOUD_RUN_EXECUTION 和 CLOUD_RUN_TASK_INDEX
+          (同一個 execution 的重試會接續進度, 新的 execution 會重新執行)
+        ＊ 輸入和 CLI 輸出只有在本地檔案仍存在且 checksum 相同時才會略過 (換了機器就會重新下載、重新執行)
+
+        Usage:
+            1. 建構 checkpoint = Checkpoint_Manager(manifest_path=本地路徑, gcs_uri=gs://bucket/path/manifest.json, execution_id=執行識別 (可省略))
+            2. 交給 CRL_Manager(config_content, script_content, checkpoint=checkpoint)
+            3. 重跑同一個任務時會讀取 manifest 並略過已完成的工作
+            4. 清除進度 checkpoint.reset()
+    """
+
+    def __init__(self, manifest_path: str, gcs_uri: str = None, execution_id: str = None):
+        """ 建構式 """
+        self.manifest_path = manifest_path
+        self.gcs_uri = gcs_uri
+        self.execution_id = execution_id if execution_id is not None else _default_execution_id()
+        self.run_id = None
+        self.manifest = self._empty_manifest()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def run_key(*contents: str):
+        """ 以任務設定和腳本內容產生任務的 key """
+        digest = hashlib.sha256()
+        for content in contents:
+            digest.update(content.encode('utf-8'))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def bind(self, run_id: str):
+        """ 讀取 manifest; 不存在或屬於其他任務 (run_id 或 execution_id 不同) 時重新開始 """
+        run_id = self.run_key(run_id, self.execution_id)
+        with self._lock:
+            self.run_id = run_id
+            # 先讀本地, 本地沒有這個任務的進度時再讀 GCS (例如 Cloud Run 重試換了機器)
+            for load in (self._load_local, self._load_gcs):
+                manifest = load()
+                if manifest and manifest.get("version") == _MANIFEST_VERSION and manifest.get("run_id") == run_id:
+                    self.manifest = manifest
+                    print(f" --> [checkpoint] 讀取進度: 已完成階段 {sorted(self.manifest['stages'])}")
+                    return
+            self.manifest = self._empty_manifest()
+            self._save()
+
+    def reset(self):
+        """ 清除進度 """
+        with self._lock:
+            self.manifest = self._empty_manifest()
+            self._save()
+
+    def stage_done(self, stage: str):
+        """ 階段是否已完成 """
+        return stage in self.manifest["stages"]
+
+    def mark_stage(self, stage: str):
+        """ 記錄階段完成 """
+        with self._lock:
+            self.manifest["stages"][stage] = datetime.now().isoformat()
+            self._save()
+
+    def entry_done(self, kind: str, key: str, local_path: str):
+        """ 輸入或輸出 (kind 為 inputs/products/outputs) 是否已完成, 且本地檔案與記錄相同 """
+        recorded = self.manifest[kind].get(key)
+        return recorded is not None and self.files_match(local_path, recorded)
+
+    def mark_entry(self, kind: str, key: str, local_path: str):
+        """ 記錄輸入或輸出完成, 以及本地檔案的 checksum """
+        files = self.file_signatures(local_path)
+        with self._lock:
+            self.manifest[kind][key] = files
+            self._save()
+
+    def files_match(self, local_path: str, recorded: Dict[str, dict]):
+        """ 本地檔案是否與記錄相同 (沒有檔案時視為不同) """
+        if not recorded:
+            return False
+        current = self.file_signatures(local_path, expected=recorded)
+        return current == recorded
+
+    @staticmethod
+    def file_signatures(local_path: str, expected: Dict[str, dict] = None):
+        """ 列出 local_path (檔案或資料夾) 下每個檔案的大小和 checksum; 大小和 expected 不同時不計算 checksum """
+        if os.path.isfile(local_path):
+            paths = [local_path]
+        else:
+            paths = []
+            for root, _, files in os.walk(local_path):
+                paths.extend(os.path.join(root, file_name) for file_name in files)
+
+        signatures = {}
+        for path in sorted(paths):
+            size = os.path.getsize(path)
+            if expected is not None and expected.get(path, {}).get("size") != size:
+                signatures[path] = {"size": size}
+                continue
+            if google_crc32c is not None:
+                signatures[path] = {"size": size, "crc32c": _file_crc32c(path)}
+            else:
+                signatures[path] = {"size": size, "md5": _file_md5(path)}
+        return signatures
+
+    def _empty_manifest(self):
+        return {"version": _MANIFEST_VERSION, "run_id": self.run_id, "stages": {}, "inputs": {}, "products": {}, "outputs": {}}
+
+    def _split_gcs_uri(self):
+        bucket_name, _, remote_file = self.gcs_uri.replace("gs://", "", 1).partition("/")
+        return bucket_name, remote_file
+
+    def _load_local(self):
+        if not os.path.isfile(self.manifest_path):
+            return None
+        try:
+            with open(self.manifest_path, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            print(f" --> [checkpoint] 無法讀取本地 manifest: {e}")
+            return None
+
+    def _load_gcs(self):
+        if not self.gcs_uri:
+            return None
+        bucket_name, remote_file = self._split_gcs_uri()
+        try:
+            blob = GCS_Manager(bucket_name).bucket.get_blob(remote_file)
+            return json.loads(blob.download_as_bytes()) if blob is not None else None
+        except Exception as e:
+            print(f" --> [checkpoint] 無法讀取 GCS manifest: {e}")
+            return None
+
+    def _save(self):
+        """ 寫入 manifest (本地以 rename 寫入, 不會留下寫一半的檔案) """
+        data = json.dumps(self.manifest, ensure_ascii=False, indent=2)
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w') as file:
+            file.write(data)
+        os.replace(tmp_path, self.manifest_path)
+
+        if self.gcs_uri:
+            bucket_name, remote_file = self._split_gcs_uri()
+            try:
+                GCS_Manager(bucket_name).bucket.blob(remote_file).upload_from_string(data, content_type="application/json")
+            except Exception as e:
+                # GCS manifest 只是備份, 失敗時不中斷分析流程
+                print(f" --> [checkpoint] 無法寫入 GCS manifest: {e}")
+
+def _default_execution_id():
+    """ Cloud Run 的 execution 和 task index; 不在 Cloud Run 上時為空字串 """
+    execution = os.environ.get("CLOUD_RUN_EXECUTION", "")
+    if not execution:
+        return ""
+    return f"{execution}/{os.environ.get('CLOUD_RUN_TASK_INDEX', '0')}"
+
+if __name__ == "__main__":
+    help(Checkpoint_Manager)
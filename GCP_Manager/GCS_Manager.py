@@ -1,6 +1,24 @@
 import warnings
 import os
-from google.cloud import storage
+import time
+import uuid
+import threading
+import base64
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import chain
+from typing import Callable, List, Tuple
+from GCP_Manager._lazy_import import lazy_module # type: ignore
+
+# google-cloud-storage 在第一次使用時才載入, 縮短 import 時間
+storage = lazy_module("google.cloud.storage")
+
+try:
+    import google_crc32c
+except ImportError:  # 沒有 crc32c 時改用 md5 比對
+    google_crc32c = None
 
 # 抑制特定的 UserWarning
 warnings.filterwarnings("ignore", category=UserWarning, module='google.auth._default')
@@ -9,6 +27,289 @@ warnings.filterwarnings("ignore", category=UserWarning, module='google.auth._def
 _COMMAND_LINE = 'command_line'
 _PYTHON = 'python'
 
+# 平行傳輸設定 (python mode)
+_DEFAULT_MAX_WORKERS = 16
+_DEFAULT_RETRIES = 3
+_RETRY_BACKOFF = 1.0  # 秒, 每次重試後加倍
+
+# 計算 checksum 時每次讀取的大小
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+# 分段 (sliced) 下載設定, 超過門檻的檔案自動切成多段平行下載
+_SLICED_THRESHOLD = 150 * 1024 * 1024
+_DEFAULT_SLICE_COUNT = 8
+_MIN_SLICE_SIZE = 32 * 1024 * 1024
+
+# 平行組合 (composite) 上傳設定, 超過門檻的檔案切成多段上傳再 compose; 一次 compose 最多 32 個物件
+# 預設不啟用 (composite_threshold=None), 需要時可指定 composite_threshold=_COMPOSITE_THRESHOLD
+_COMPOSITE_THRESHOLD = 150 * 1024 * 1024
+_DEFAULT_COMPOSITE_PARTS = 8
+_MAX_COMPOSE_COMPONENTS = 32
+_MIN_PART_SIZE = 32 * 1024 * 1024
+_COMPOSITE_TMP_PREFIX = "gcp_manager_tmp/composite"
+
+# 列表設定, 只取需要的 metadata 欄位以減少傳輸量
+_LIST_PAGE_SIZE = 1000
+_LIST_FIELDS = "items(name,size,crc32c,md5Hash,generation,contentEncoding,updated),nextPageToken"
+
+# 共用 client 的 HTTP 連線池大小 (keep-alive), 需大於平行傳輸的 thread 數量
+_HTTP_POOL_SIZE = 128
+
+# 批次刪除設定, 一個 batch request 最多 100 個子請求
+_MAX_BATCH_SIZE = 100
+
+# 串流傳輸設定, resumable upload 的 chunk 大小必須是 256 KiB 的倍數
+_STREAM_CHUNK_SIZE = 8 * 1024 * 1024
+_STREAM_CHUNK_ALIGNMENT = 256 * 1024
+
+@dataclass
+class TRANSFER_FAILURE:
+    source: str
+    destination: str
+    error: str
+    attempts: int
+
+@dataclass
+class TRANSFER_RESULT:
+    succeeded: List[str] = field(default_factory=list)
+    failed: List[TRANSFER_FAILURE] = field(default_factory=list)
+    bytes_transferred: int = 0
+    elapsed: float = 0.0
+    skipped: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+
+    def __bool__(self):
+        """ 沒有失敗的檔案才算成功 """
+        return len(self.failed) == 0
+
+def _with_retry(task, retries):
+    """ 執行工作並重試 (指數退避), 回傳 (結果, 錯誤, 嘗試次數) """
+    attempts = 0
+    while True:
+        attempts += 1
+        try:
+            return task(), None, attempts
+        except Exception as e:
+            # generation 條件不符 (HTTP 412) 代表遠端已被其他人修改, 重試也不會成功
+            if attempts > retries or getattr(e, "code", None) == 412:
+                return None, e, attempts
+            time.sleep(_RETRY_BACKOFF * (2 ** (attempts - 1)))
+
+class _Positional_Writer:
+    """ 從指定 offset 開始以 pwrite 寫入檔案, 讓多個 thread 寫入同一個檔案的不同區段 """
+
+    def __init__(self, fd, offset):
+        self.fd = fd
+        self.offset = offset
+
+    def write(self, data):
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(self.fd, view, self.offset)
+            self.offset += written
+            view = view[written:]
+        return len(data)
+
+class _File_Slice:
+    """ 將檔案的一段 (offset, length) 包裝成從 0 開始的唯讀 file-like, 用於分段上傳 """
+
+    def __init__(self, local_file, offset, length):
+        self._file = open(local_file, 'rb')
+        self._offset = offset
+        self._length = length
+        self._position = 0
+        self._file.seek(offset)
+
+    def read(self, size=-1):
+        remaining = self._length - self._position
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        data = self._file.read(size)
+        self._position += len(data)
+        return data
+
+    def tell(self):
+        return self._position
+
+    def seek(self, position, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            position += self._position
+        elif whence == os.SEEK_END:
+            position += self._length
+        self._position = max(0, min(position, self._length))
+        self._file.seek(self._offset + self._position)
+        return self._position
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+@lru_cache(maxsize=None)
+def _recording_batch_class():
+    """ 第一次使用時才定義 (需要載入 google-cloud-storage) """
+    from google.cloud.storage.batch import Batch
+
+    class _Recording_Batch(Batch):
+        """ 保留每個子請求回應的 Batch, 單一物件失敗時不拋出例外 """
+
+        def finish(self, raise_exception=True):
+            self.responses = super().finish(raise_exception=False)
+            return self.responses
+
+    return _Recording_Batch
+
+class _Listing_Index:
+    """ prefix -> blob 列表的記憶體索引, 超過 ttl 秒後失效; 寫入或刪除時清除相關的 prefix """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, prefix):
+        """ 取得涵蓋 prefix 的列表 (可從較短的 prefix 篩選), 沒有或已過期時回傳 None """
+        now = time.monotonic()
+        with self._lock:
+            for cached_prefix, (created, blobs) in list(self._entries.items()):
+                if now - created > self.ttl:
+                    del self._entries[cached_prefix]
+                elif prefix.startswith(cached_prefix):
+                    return [blob for blob in blobs if blob.name.startswith(prefix)]
+        return None
+
+    def put(self, prefix, blobs):
+        with self._lock:
+            self._entries[prefix] = (time.monotonic(), blobs)
+
+    def invalidate(self, name_or_prefix):
+        """ 清除與 name_or_prefix 重疊的列表 """
+        with self._lock:
+            for cached_prefix in list(self._entries):
+                if name_or_prefix.startswith(cached_prefix) or cached_prefix.startswith(name_or_prefix):
+                    del self._entries[cached_prefix]
+
+class _Client_Registry:
+    """ 整個 process 共用的 storage client 和 bucket handle, 避免每個 GCS_Manager 重新取得憑證和建立連線 """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._buckets = {}
+        self._stats = {"clients_created": 0, "clients_reused": 0, "buckets_created": 0, "buckets_reused": 0}
+
+    def get_client(self, project=None):
+        """ 取得 (或建立) project 的 client """
+        with self._lock:
+            return self._get_client_locked(project)
+
+    def get_bucket(self, bucket_name, project=None):
+        """ 取得 (或建立) bucket handle """
+        with self._lock:
+            bucket = self._buckets.get((project, bucket_name))
+            if bucket is None:
+                bucket = self._get_client_locked(project).bucket(bucket_name)
+                self._buckets[(project, bucket_name)] = bucket
+                self._stats["buckets_created"] += 1
+            else:
+                self._stats["buckets_reused"] += 1
+            return bucket
+
+    def _get_client_locked(self, project):
+        client = self._clients.get(project)
+        if client is None:
+            client = self._create_client(project)
+            self._clients[project] = client
+            self._stats["clients_created"] += 1
+        else:
+            self._stats["clients_reused"] += 1
+        return client
+
+    def stats(self):
+        """ 回傳 client / bucket handle 建立和重複使用的次數 """
+        with self._lock:
+            return dict(self._stats)
+
+    def clear(self):
+        """ 清除所有快取的 client 和 bucket handle """
+        with self._lock:
+            self._clients.clear()
+            self._buckets.clear()
+
+    def batch(self, client):
+        """ 建立 batch request (保留每個子請求的回應) """
+        return _recording_batch_class()(client)
+
+    @staticmethod
+    def _create_client(project):
+        """ 建立 client, 並換成較大的 keep-alive 連線池以支援平行傳輸 """
+        from requests.adapters import HTTPAdapter
+        client = storage.Client() if project is None else storage.Client(project=project)
+        adapter = HTTPAdapter(pool_connections=_HTTP_POOL_SIZE, pool_maxsize=_HTTP_POOL_SIZE)
+        client._http.mount("https://", adapter)
+        return client
+
+_CLIENT_REGISTRY = _Client_Registry()
+
+# 其他 storage backend (例如 Local_Storage_Backend), None 時使用真正的 GCS
+_STORAGE_BACKEND = None
+
+def get_client_registry():
+    """ 取得 process 共用的 client registry (可查看 stats()) """
+    return _CLIENT_REGISTRY
+
+def set_storage_backend(backend=None):
+    """ 切換整個 process 的 storage backend (需有 get_bucket, get_client, batch, stats, clear), None 時回到 GCS """
+    global _STORAGE_BACKEND
+    _STORAGE_BACKEND = backend
+
+def get_storage_backend():
+    """ 取得目前的 storage backend """
+    return _STORAGE_BACKEND if _STORAGE_BACKEND is not None else _CLIENT_REGISTRY
+
+def _file_crc32c(local_file):
+    """ 計算本地檔案的 crc32c (base64, 與 GCS metadata 相同格式) """
+    checksum = google_crc32c.Checksum()
+    with open(local_file, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+            checksum.update(block)
+    return base64.b64encode(checksum.digest()).decode('utf-8')
+
+def _file_md5(local_file):
+    """ 計算本地檔案的 md5 (base64, 與 GCS metadata 相同格式) """
+    md5 = hashlib.md5()
+    with open(local_file, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+            md5.update(block)
+    return base64.b64encode(md5.digest()).decode('utf-8')
+
+def _local_matches_blob(local_file, blob):
+    """ 比對本地檔案和遠端 blob 是否相同 (先比大小, 再比 crc32c 或 md5) """
+    if not os.path.isfile(local_file) or blob.size is None:
+        return False
+    if os.path.getsize(local_file) != blob.size:
+        return False
+    if blob.crc32c and google_crc32c is not None:
+        return _file_crc32c(local_file) == blob.crc32c
+    if blob.md5_hash:
+        return _file_md5(local_file) == blob.md5_hash
+    # 沒有可比對的 checksum, 視為不同
+    return False
+
+def _read_chunks(source, chunk_size):
+    """ 從 file-like 逐段讀取 bytes, 讀到空值 (EOF) 時結束; 文字模式的 source 拋出 TypeError """
+    while True:
+        chunk = source.read(chunk_size)
+        if isinstance(chunk, str):
+            raise TypeError("upload_stream 的 source 需要以二進位模式開啟 (read 需回傳 bytes), 文字請先 encode 或使用 open_writer(encoding=...)")
+        if not chunk:
+            return
+        yield chunk
+
 class GCS_Manager:
     
     """
@@ -22,46 +323,90 @@ class GCS_Manager:
             5. 上傳檔案 manager.upload_file(local_file=本地路徑, remote_file=遠端路徑, mode='python'或'command_line')
             6. 下載資料夾 manager.download_folder(remote_folder=遠端路徑, local_folder=本地路徑, mode='python'或'command_line')
             7. 上傳資料夾 manager.upload_folder(local_folder=本地路徑, remote_folder=遠端路徑, mode='python'或'command_line')
+
+        ＊ python mode 的資料夾傳輸會用 thread pool 平行傳輸, 可用 max_workers / retries 調整,
+          回傳 TRANSFER_RESULT (成功、失敗的檔案和傳輸的 bytes)
+        ＊ 同步資料夾 (類似 rsync, 只傳輸新的或有變動的檔案):
+            manager.sync_down(remote_folder=遠端路徑, local_folder=本地路徑, delete_extraneous=False)
+            manager.sync_up(local_folder=本地路徑, remote_folder=遠端路徑, delete_extraneous=False)
+            manager.sync_file_up(local_file=本地路徑, remote_file=遠端路徑)
+          上傳時以 generation 為條件覆寫 (if_generation_match), 遠端在比對後被修改時該檔案會失敗, 不會覆蓋別人的版本
+        ＊ 組合上傳需指定 composite_threshold 才會啟用: 組合後的物件沒有 md5 (只有 crc32c), 以 md5 比對的工具無法使用;
+          process 中斷時暫存物件會留在目的 bucket 的 gcp_manager_tmp/composite/ 下, 需要自行清除
+        ＊ set_storage_backend(Local_Storage_Backend(...)) 可以換成本地的假 GCS (離線測試、benchmark), command_line mode 不支援
+        ＊ 串流傳輸 (不經過本地暫存檔, 記憶體用量固定為 chunk_size):
+            reader = manager.open_reader(remote_file=遠端路徑)          # file-like, 可直接給 pandas.read_csv
+            writer = manager.open_writer(remote_file=遠端路徑)          # file-like, 寫完要 close()
+            for chunk in manager.iter_download(remote_file=遠端路徑): ...
+            manager.download_to_writer(remote_file=遠端路徑, writer=可寫入的 file-like)
+            manager.upload_stream(source=file-like 或 bytes 的 iterator, remote_file=遠端路徑)
     """
 
-    def __init__(self, bucket_name):
+    def __init__(self, bucket_name, max_workers=_DEFAULT_MAX_WORKERS, retries=_DEFAULT_RETRIES,
+                 sliced_threshold=_SLICED_THRESHOLD, slice_count=_DEFAULT_SLICE_COUNT,
+                 composite_threshold=None, composite_parts=_DEFAULT_COMPOSITE_PARTS,
+                 listing_ttl=None, project=None):
 
         """ 建構式"""
 
         # Bucket name
         self.bucket_name = bucket_name
 
-        # Client
-        self.client = storage.Client()
-        self.bucket = self.client.bucket(self.bucket_name)
+        # 平行傳輸設定
+        self.max_workers = max_workers
+        self.retries = retries
+
+        # 分段下載設定, sliced_threshold=None 時停用
+        self.sliced_threshold = sliced_threshold
+        self.slice_count = slice_count
+
+        # 組合上傳設定, 預設 composite_threshold=None 不啟用
+        self.composite_threshold = composite_threshold
+        self.composite_parts = min(composite_parts, _MAX_COMPOSE_COMPONENTS)
+
+        # 列表索引, listing_ttl (秒) 為 None 時不快取列表
+        self._listing_index = _Listing_Index(listing_ttl) if listing_ttl is not None else None
+
+        # Client, 同一個 process 內共用
+        self.project = project
+        self.bucket = get_storage_backend().get_bucket(self.bucket_name, project)
+        self.client = self.bucket.client
 
 
     def download_file(self, remote_file, local_file, mode=_PYTHON):
         """ 下載單個檔案 """
         if mode == _PYTHON:
-            blob = self.bucket.blob(remote_file)
-            blob.download_to_filename(local_file)
+            if self.sliced_threshold is None:
+                self._download_blob(self.bucket.blob(remote_file), local_file)
+            else:
+                # 需要檔案大小決定是否分段下載: 以 get_blob 取得一次 metadata, 之後的下載都用同一個 blob (同一個 generation)
+                blob = self.bucket.get_blob(remote_file)
+                if blob is None:
+                    raise FileNotFoundError(f"gs://{self.bucket_name}/{remote_file} 不存在")
+                self._download_blob(blob, local_file, if_generation_match=blob.generation)
             print(f" --> [下載檔案] \n --> 遠端檔案：{remote_file} \n --> 下載到：{local_file} \n")
         elif mode == _COMMAND_LINE:
             os.system(f"gsutil -m cp gs://{self.bucket_name}/{remote_file} {local_file}")
             print(f" --> [下載檔案] \n --> 遠端檔案：{remote_file} \n --> 下載到：{local_file} \n")
 
-    def download_folder(self, remote_folder, local_folder, mode=_PYTHON):
+    def download_folder(self, remote_folder, local_folder, mode=_PYTHON, max_workers=None, retries=None):
         """ 下載整個資料夾 """
         if mode == _PYTHON:
             # 確保本地目錄存在
             if not os.path.exists(local_folder):
                 os.makedirs(local_folder)
-            
-            for blob in self.bucket.list_blobs(prefix=remote_folder):
-                # 確保子目錄存在
+
+            tasks = []
+            for blob in self.list_prefix(remote_folder):
+                # 略過資料夾佔位物件
+                if blob.name.endswith("/"):
+                    continue
                 local_file_path = os.path.join(local_folder, blob.name)
-                local_file_dir = os.path.dirname(local_file_path)
-                if not os.path.exists(local_file_dir):
-                    os.makedirs(local_file_dir)
-                
-                blob.download_to_filename(local_file_path)
-                print(f" --> [下載檔案] \n --> 遠端檔案：{blob.name} \n --> 下載到：{local_folder}/{blob.name} \n")
+                tasks.append((blob.name, local_file_path, self._download_task(blob, local_file_path)))
+
+            result = self._run_transfers(tasks, max_workers, retries)
+            print(f" --> [下載資料夾] \n --> 遠端資料夾：{remote_folder} \n --> 下載到：{local_folder} \n --> 成功 {len(result.succeeded)} 個, 失敗 {len(result.failed)} 個, 共 {result.bytes_transferred} bytes, 耗時 {result.elapsed:.2f} 秒 \n")
+            return result
         elif mode == _COMMAND_LINE:
             os.system(f"gsutil -m cp -r gs://{self.bucket_name}/{remote_folder} {local_folder}")
             print(f" --> [下載資料夾] \n --> 遠端資料夾：{remote_folder} \n --> 下載到：{local_folder} \n")
@@ -69,52 +414,422 @@ class GCS_Manager:
     def upload_file(self, local_file, remote_file, mode=_PYTHON):
         """ 上傳單個檔案 """
         if mode == _PYTHON:
-            blob = self.bucket.blob(remote_file)
-            blob.upload_from_filename(local_file)
+            self._upload_blob(local_file, remote_file)
             print(f" --> [上傳檔案] \n --> 本地檔案：{local_file} \n --> 上傳到：{remote_file} \n")
         elif mode == _COMMAND_LINE:
             os.system(f"gsutil -m cp {local_file} gs://{self.bucket_name}/{remote_file}")
             print(f" --> [上傳檔案] \n --> 本地檔案：{local_file} \n --> 上傳到：{remote_file} \n")
+        self._invalidate_listing(remote_file)
 
-    def upload_folder(self, local_folder, remote_folder, mode=_PYTHON):
+    def upload_folder(self, local_folder, remote_folder, mode=_PYTHON, max_workers=None, retries=None):
         """ 上傳整個資料夾 """
         if mode == _PYTHON:
+            tasks = []
             for root, _, files in os.walk(local_folder):
                 for file_name in files:
                     local_file_path = os.path.join(root, file_name)
                     relative_path = os.path.relpath(local_file_path, local_folder)
                     destination_blob_name = os.path.join(remote_folder, relative_path)
+                    tasks.append((local_file_path, destination_blob_name, self._upload_task(local_file_path, destination_blob_name)))
 
-                    # 上傳檔案
-                    blob = self.bucket.blob(destination_blob_name)
-                    blob.upload_from_filename(local_file_path)
-                    print(f" --> [上傳檔案] \n --> 本地檔案：{local_file_path} \n --> 上傳到：{destination_blob_name} \n")
+            result = self._run_transfers(tasks, max_workers, retries)
+            self._invalidate_listing(remote_folder)
+            print(f" --> [上傳資料夾] \n --> 本地資料夾：{local_folder} \n --> 上傳到：{remote_folder} \n --> 成功 {len(result.succeeded)} 個, 失敗 {len(result.failed)} 個, 共 {result.bytes_transferred} bytes, 耗時 {result.elapsed:.2f} 秒 \n")
+            return result
         elif mode == _COMMAND_LINE:
             os.system(f"gsutil -m cp -r {local_folder} gs://{self.bucket_name}/{remote_folder}")
+            self._invalidate_listing(remote_folder)
             print(f" --> [上傳資料夾] \n --> 本地資料夾：{local_folder} \n --> 上傳到：{remote_folder} \n")
 
+    def sync_down(self, remote_folder, local_folder, delete_extraneous=False, max_workers=None, retries=None):
+        """ 同步遠端資料夾到本地, 只下載新的或有變動的檔案 """
+        prefix = remote_folder.rstrip("/") + "/"
+        os.makedirs(local_folder, exist_ok=True)
+
+        tasks = []
+        skipped = []
+        remote_relative_paths = set()
+        for blob in self.list_prefix(prefix):
+            if blob.name.endswith("/"):
+                continue
+            relative_path = blob.name[len(prefix):]
+            remote_relative_paths.add(relative_path)
+            local_file_path = os.path.join(local_folder, relative_path)
+            if _local_matches_blob(local_file_path, blob):
+                skipped.append(local_file_path)
+                continue
+            # 以列表時的 generation 作為條件, 確保下載到的是比對過的版本
+            tasks.append((blob.name, local_file_path, self._download_task(blob, local_file_path, if_generation_match=blob.generation)))
+
+        result = self._run_transfers(tasks, max_workers, retries)
+        result.skipped = skipped
+
+        # 刪除遠端不存在的本地檔案
+        if delete_extraneous:
+            for root, _, files in os.walk(local_folder):
+                for file_name in files:
+                    local_file_path = os.path.join(root, file_name)
+                    relative_path = os.path.relpath(local_file_path, local_folder).replace(os.sep, "/")
+                    if relative_path not in remote_relative_paths:
+                        os.remove(local_file_path)
+                        result.deleted.append(local_file_path)
+                        print(f" --> [刪除本地檔案] \n --> 本地檔案：{local_file_path} \n")
+
+        print(f" --> [同步下載] \n --> 遠端資料夾：{remote_folder} \n --> 本地資料夾：{local_folder} \n --> 下載 {len(result.succeeded)} 個, 略過 {len(result.skipped)} 個, 刪除 {len(result.deleted)} 個, 失敗 {len(result.failed)} 個 \n")
+        return result
+
+    def sync_up(self, local_folder, remote_folder, delete_extraneous=False, max_workers=None, retries=None):
+        """ 同步本地資料夾到遠端, 只上傳新的或有變動的檔案 """
+        prefix = remote_folder.rstrip("/") + "/"
+        remote_blobs = {}
+        for blob in self.list_prefix(prefix):
+            if not blob.name.endswith("/"):
+                remote_blobs[blob.name[len(prefix):]] = blob
+
+        tasks = []
+        skipped = []
+        local_relative_paths = set()
+        for root, _, files in os.walk(local_folder):
+            for file_name in files:
+                local_file_path = os.path.join(root, file_name)
+                relative_path = os.path.relpath(local_file_path, local_folder).replace(os.sep, "/")
+                local_relative_paths.add(relative_path)
+                blob = remote_blobs.get(relative_path)
+                if blob is not None and _local_matches_blob(local_file_path, blob):
+                    skipped.append(blob.name)
+                    continue
+                # 以列表時的 generation 作為條件覆寫 (新檔案為 0, 即遠端必須不存在), 不需要先刪除
+                generation = blob.generation if blob is not None else 0
+                tasks.append((local_file_path, prefix + relative_path, self._upload_task(local_file_path, prefix + relative_path, if_generation_match=generation)))
+
+        result = self._run_transfers(tasks, max_workers, retries)
+        result.skipped = skipped
+
+        # 刪除本地不存在的遠端檔案
+        if delete_extraneous:
+            extraneous = [blob.name for relative_path, blob in remote_blobs.items() if relative_path not in local_relative_paths]
+            delete_result = self.delete_blobs(extraneous, max_workers=max_workers, retries=retries)
+            result.deleted.extend(delete_result.deleted)
+            result.failed.extend(delete_result.failed)
+        self._invalidate_listing(prefix)
+
+        print(f" --> [同步上傳] \n --> 本地資料夾：{local_folder} \n --> 遠端資料夾：{remote_folder} \n --> 上傳 {len(result.succeeded)} 個, 略過 {len(result.skipped)} 個, 刪除 {len(result.deleted)} 個, 失敗 {len(result.failed)} 個 \n")
+        return result
+
+    def sync_file_up(self, local_file, remote_file, retries=None):
+        """ 同步單個檔案到遠端, 內容相同時略過, 否則以 generation 為條件覆寫 """
+        blob = self.bucket.get_blob(remote_file)
+        if blob is not None and _local_matches_blob(local_file, blob):
+            result = TRANSFER_RESULT(skipped=[remote_file])
+        else:
+            generation = blob.generation if blob is not None else 0
+            result = self._run_transfers([(local_file, remote_file, self._upload_task(local_file, remote_file, if_generation_match=generation))], retries=retries)
+            self._invalidate_listing(remote_file)
+        print(f" --> [同步上傳檔案] \n --> 本地檔案：{local_file} \n --> 遠端檔案：{remote_file} \n --> 上傳 {len(result.succeeded)} 個, 略過 {len(result.skipped)} 個, 失敗 {len(result.failed)} 個 \n")
+        return result
+
+    def open_reader(self, remote_file, chunk_size=_STREAM_CHUNK_SIZE, encoding=None):
+        """ 開啟遠端檔案的串流讀取 (以 ranged read 分段讀取), 指定 encoding 時為文字模式 """
+        blob = self.bucket.blob(remote_file)
+        if encoding is not None:
+            return blob.open("rt", chunk_size=chunk_size, encoding=encoding)
+        return blob.open("rb", chunk_size=chunk_size)
+
+    def open_writer(self, remote_file, chunk_size=_STREAM_CHUNK_SIZE, encoding=None, content_type=None):
+        """ 開啟遠端檔案的串流寫入 (chunked resumable upload), 指定 encoding 時為文字模式 """
+        if chunk_size % _STREAM_CHUNK_ALIGNMENT != 0:
+            raise ValueError(f"chunk_size 必須是 {_STREAM_CHUNK_ALIGNMENT} bytes 的倍數, 但提供 {chunk_size}")
+        blob = self.bucket.blob(remote_file)
+        # pandas 等套件會呼叫 flush(), resumable upload 只能在 chunk 滿的時候送出, 因此忽略 flush
+        if encoding is not None:
+            return blob.open("wt", chunk_size=chunk_size, encoding=encoding, content_type=content_type, ignore_flush=True)
+        return blob.open("wb", chunk_size=chunk_size, content_type=content_type, ignore_flush=True)
+
+    def iter_download(self, remote_file, chunk_size=_STREAM_CHUNK_SIZE):
+        """ 以 chunk 逐段下載遠端檔案 (generator) """
+        with self.open_reader(remote_file, chunk_size=chunk_size) as reader:
+            for chunk in iter(lambda: reader.read(chunk_size), b""):
+                yield chunk
+
+    def download_to_writer(self, remote_file, writer, chunk_size=_STREAM_CHUNK_SIZE):
+        """ 將遠端檔案串流寫入 writer (需有 write 方法), 回傳傳輸的 bytes """
+        n_bytes = 0
+        for chunk in self.iter_download(remote_file, chunk_size=chunk_size):
+            writer.write(chunk)
+            n_bytes += len(chunk)
+        print(f" --> [串流下載] \n --> 遠端檔案：{remote_file} \n --> 共 {n_bytes} bytes \n")
+        return n_bytes
+
+    def upload_stream(self, source, remote_file, chunk_size=_STREAM_CHUNK_SIZE, content_type=None):
+        """ 將 file-like (需有 read 方法) 或 bytes 的 iterator 串流上傳, 回傳傳輸的 bytes """
+        if hasattr(source, "read"):
+            # 先讀第一段, 文字模式的 source 在開始上傳前就拋出 TypeError
+            chunks = _read_chunks(source, chunk_size)
+            first_chunk = next(chunks, None)
+            chunks = chain([first_chunk], chunks) if first_chunk is not None else iter(())
+        else:
+            chunks = source
+
+        n_bytes = 0
+        with self.open_writer(remote_file, chunk_size=chunk_size, content_type=content_type) as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+                n_bytes += len(chunk)
+        self._invalidate_listing(remote_file)
+        print(f" --> [串流上傳] \n --> 上傳到：{remote_file} \n --> 共 {n_bytes} bytes \n")
+        return n_bytes
+
+    def _download_task(self, blob, local_file_path, if_generation_match=None):
+        """ 建立單一 blob 的下載工作, 回傳傳輸的 bytes """
+        def task():
+            os.makedirs(os.path.dirname(local_file_path) or ".", exist_ok=True)
+            self._download_blob(blob, local_file_path, if_generation_match=if_generation_match)
+            print(f" --> [下載檔案] \n --> 遠端檔案：{blob.name} \n --> 下載到：{local_file_path} \n")
+            return os.path.getsize(local_file_path)
+        return task
+
+    def _download_blob(self, blob, local_file, if_generation_match=None):
+        """ 下載單一 blob, 超過門檻且大小已知時改用分段下載 """
+        if self._use_sliced_download(blob):
+            self._download_sliced(blob, local_file)
+        else:
+            blob.download_to_filename(local_file, if_generation_match=if_generation_match)
+
+    def _use_sliced_download(self, blob):
+        """ 判斷是否使用分段下載 (gzip 轉碼的物件無法以 byte range 讀取) """
+        return (
+            self.sliced_threshold is not None
+            and blob.size is not None
+            and blob.size > 0
+            and blob.size >= self.sliced_threshold
+            and blob.content_encoding != "gzip"
+        )
+
+    def _download_sliced(self, blob, local_file):
+        """ 將 blob 切成多段 byte range 平行下載到預先配置的檔案, 完成後檢查 checksum """
+        size = blob.size
+        slice_count = max(1, min(self.slice_count, -(-size // _MIN_SLICE_SIZE)))
+        slice_size = -(-size // slice_count)
+        ranges = [(start, min(start + slice_size, size) - 1) for start in range(0, size, slice_size)]
+
+        fd = os.open(local_file, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            # 預先配置檔案空間
+            if hasattr(os, "posix_fallocate"):
+                os.posix_fallocate(fd, 0, size)
+            else:
+                os.ftruncate(fd, size)
+
+            def fetch_slice(start, end):
+                def task():
+                    writer = _Positional_Writer(fd, start)
+                    # 各段不檢查 checksum, 最後整個檔案一起檢查; 以 generation 確保每段來自同一版本
+                    blob.download_to_file(writer, start=start, end=end, checksum=None, if_generation_match=blob.generation)
+                    if writer.offset != end + 1:
+                        raise IOError(f"分段下載不完整: {blob.name} bytes {start}-{end}")
+                return task
+
+            with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+                futures = [executor.submit(_with_retry, fetch_slice(start, end), self.retries) for start, end in ranges]
+                errors = [error for _, error, _ in (future.result() for future in futures) if error is not None]
+            if errors:
+                raise errors[0]
+        except Exception:
+            os.close(fd)
+            os.remove(local_file)
+            raise
+        os.close(fd)
+
+        # 檢查整個檔案的 checksum
+        if blob.crc32c and google_crc32c is not None:
+            local_checksum, remote_checksum = _file_crc32c(local_file), blob.crc32c
+        elif blob.md5_hash:
+            local_checksum, remote_checksum = _file_md5(local_file), blob.md5_hash
+        else:
+            local_checksum = remote_checksum = None
+        if local_checksum != remote_checksum:
+            os.remove(local_file)
+            raise IOError(f"分段下載 checksum 不符: {blob.name} (本地 {local_checksum}, 遠端 {remote_checksum})")
+        print(f" --> [分段下載] {blob.name} 共 {size} bytes, 分成 {len(ranges)} 段")
+
+    def _upload_task(self, local_file_path, destination_blob_name, if_generation_match=None):
+        """ 建立單一檔案的上傳工作, 回傳傳輸的 bytes """
+        def task():
+            self._upload_blob(local_file_path, destination_blob_name, if_generation_match=if_generation_match)
+            print(f" --> [上傳檔案] \n --> 本地檔案：{local_file_path} \n --> 上傳到：{destination_blob_name} \n")
+            return os.path.getsize(local_file_path)
+        return task
+
+    def _upload_blob(self, local_file, remote_file, if_generation_match=None):
+        """ 上傳單一檔案, 超過門檻時改用組合上傳; if_generation_match 為覆寫條件 (0 表示遠端必須不存在) """
+        if self.composite_threshold is not None and os.path.getsize(local_file) >= max(1, self.composite_threshold):
+            self._upload_composite(local_file, remote_file, if_generation_match=if_generation_match)
+        else:
+            self.bucket.blob(remote_file).upload_from_filename(local_file, if_generation_match=if_generation_match)
+
+    def _upload_composite(self, local_file, remote_file, if_generation_match=None):
+        """ 將檔案切成多段平行上傳成暫存物件, compose 成目的物件後檢查 checksum 並清除暫存物件 """
+        size = os.path.getsize(local_file)
+        part_count = max(1, min(self.composite_parts, -(-size // _MIN_PART_SIZE)))
+        part_size = -(-size // part_count)
+        ranges = [(offset, min(part_size, size - offset)) for offset in range(0, size, part_size)]
+
+        tmp_prefix = f"{_COMPOSITE_TMP_PREFIX}/{uuid.uuid4().hex}"
+        parts = [self.bucket.blob(f"{tmp_prefix}/{i:03d}") for i in range(len(ranges))]
+        try:
+            def upload_part(part, offset, length):
+                def task():
+                    with _File_Slice(local_file, offset, length) as file_slice:
+                        part.upload_from_file(file_slice, size=length, if_generation_match=0)
+                return task
+
+            with ThreadPoolExecutor(max_workers=len(parts)) as executor:
+                futures = [executor.submit(_with_retry, upload_part(part, offset, length), self.retries) for part, (offset, length) in zip(parts, ranges)]
+                errors = [error for _, error, _ in (future.result() for future in futures) if error is not None]
+            if errors:
+                raise errors[0]
+
+            destination = self.bucket.blob(remote_file)
+            destination.compose(parts, if_generation_match=if_generation_match)
+
+            # 組合物件沒有 md5, 以 crc32c 檢查
+            destination.reload()
+            if destination.size != size or (google_crc32c is not None and destination.crc32c != _file_crc32c(local_file)):
+                destination.delete()
+                raise IOError(f"組合上傳 checksum 不符: {remote_file}")
+            print(f" --> [組合上傳] {remote_file} 共 {size} bytes, 分成 {len(parts)} 段")
+        finally:
+            # 清除暫存物件
+            for part in parts:
+                try:
+                    part.delete()
+                except Exception:
+                    pass
+
+    def _run_transfers(self, tasks: List[Tuple[str, str, Callable[[], int]]], max_workers=None, retries=None):
+        """ 以 thread pool 平行執行傳輸工作 (source, destination, task), 每個檔案各自重試 """
+        max_workers = max_workers or self.max_workers
+        retries = self.retries if retries is None else retries
+        result = TRANSFER_RESULT()
+        start_time = time.monotonic()
+
+        if tasks:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tasks)))) as executor:
+                futures = {executor.submit(_with_retry, task, retries): (source, destination) for source, destination, task in tasks}
+                for future in as_completed(futures):
+                    source, destination = futures[future]
+                    n_bytes, error, attempts = future.result()
+                    if error is None:
+                        result.succeeded.append(destination)
+                        result.bytes_transferred += n_bytes
+                    else:
+                        print(f" --> [傳輸失敗] \n --> 來源：{source} \n --> 目的：{destination} \n --> 錯誤：{error} \n")
+                        result.failed.append(TRANSFER_FAILURE(source, destination, str(error), attempts))
+
+        result.elapsed = time.monotonic() - start_time
+        return result
+
+    def list_prefix(self, prefix):
+        """ 列出 prefix 下的 blob; 有列表索引時回傳 (並快取) 列表, 否則回傳逐頁讀取的 generator """
+        if self._listing_index is None:
+            return self.iter_blobs(prefix)
+        blobs = self._listing_index.get(prefix)
+        if blobs is None:
+            blobs = list(self.iter_blobs(prefix))
+            self._listing_index.put(prefix, blobs)
+        return blobs
+
+    def iter_blobs(self, prefix, page_size=_LIST_PAGE_SIZE):
+        """ 逐頁列出 prefix 下的 blob (generator), 只取傳輸和比對需要的欄位 """
+        yield from self.bucket.list_blobs(prefix=prefix, fields=_LIST_FIELDS, page_size=page_size)
+
+    def _invalidate_listing(self, name_or_prefix):
+        """ 寫入或刪除後清除相關的列表索引 """
+        if self._listing_index is not None:
+            self._listing_index.invalidate(name_or_prefix)
+
     def check_file_exists(self, remote_path):
         """ 檢查遠端檔案是否存在 """
         blob = self.bucket.blob(remote_path)
-        print(f" --> 檢查遠端檔案是否存在: {remote_path}; 檢查結果: {blob.exists()}")
-        return blob.exists()
+        file_exists = blob.exists()
+        print(f" --> 檢查遠端檔案是否存在: {remote_path}; 檢查結果: {file_exists}")
+        return file_exists
     
     def check_folder_exists(self, remote_folder):
         """ 檢查遠端資料夾是否存在 """
-        blobs = list(self.bucket.list_blobs(prefix=remote_folder))
-        folder_exists = len(blobs) > 0
+        if self._listing_index is not None:
+            # 有列表索引時列出整個 prefix, 之後的下載或刪除可以直接使用
+            folder_exists = len(self.list_prefix(remote_folder)) > 0
+        else:
+            # 只需要知道有沒有物件, 取到第一個就停止
+            blobs = self.bucket.list_blobs(prefix=remote_folder, max_results=1, fields="items(name),nextPageToken")
+            folder_exists = next(iter(blobs), None) is not None
         print(f" --> 檢查遠端資料夾是否存在: {remote_folder}; 檢查結果: {folder_exists}")
         return folder_exists
 
-    def delete_remote_folder(self, remote_folder, mode=_PYTHON):
+    def delete_remote_folder(self, remote_folder, mode=_PYTHON, max_workers=None, retries=None):
         """ 刪除遠端資料夾 """
+        result = None
         if mode == _PYTHON:
-            for blob in self.bucket.list_blobs(prefix=remote_folder):
-                blob.delete()
-                print(f" --> [刪除檔案] \n --> 遠端檔案：{blob.name} \n")
+            blob_names = [blob.name for blob in self.list_prefix(remote_folder)]
+            result = self.delete_blobs(blob_names, max_workers=max_workers, retries=retries)
+            print(f" --> [刪除資料夾] \n --> 遠端資料夾：{remote_folder} \n --> 刪除 {len(result.deleted)} 個, 失敗 {len(result.failed)} 個, 耗時 {result.elapsed:.2f} 秒 \n")
         elif mode == _COMMAND_LINE:
             os.system(f"gsutil -m rm -rf gs://{self.bucket_name}/{remote_folder}")
             print(f" --> [刪除資料夾] \n --> 遠端資料夾：{remote_folder} \n")
+        self._invalidate_listing(remote_folder)
+        return result
+
+    def delete_blobs(self, blob_names, max_workers=None, retries=None):
+        """ 以 batch request 批次刪除多個遠端檔案, 多批平行送出, 失敗的物件個別重試並回報 """
+        max_workers = max_workers or self.max_workers
+        retries = self.retries if retries is None else retries
+        result = TRANSFER_RESULT()
+        start_time = time.monotonic()
+
+        def delete_batch(batch_names):
+            """ 刪除一批物件, 回傳 (已刪除, [(名稱, 錯誤, 嘗試次數)]) """
+            deleted = []
+            errors = {}
+            pending = list(batch_names)
+            attempts = 0
+            while pending and attempts <= retries:
+                if attempts > 0:
+                    time.sleep(_RETRY_BACKOFF * (2 ** (attempts - 1)))
+                attempts += 1
+                try:
+                    with get_storage_backend().batch(self.client) as batch:
+                        for name in pending:
+                            self.bucket.delete_blob(name)
+                except Exception as e:
+                    # 整批失敗 (例如網路錯誤), 整批重試
+                    errors = {name: str(e) for name in pending}
+                    continue
+
+                failed_names = []
+                for name, response in zip(pending, batch.responses):
+                    # 404 代表物件已不存在, 視為刪除成功
+                    if 200 <= response.status_code < 300 or response.status_code == 404:
+                        deleted.append(name)
+                    else:
+                        errors[name] = f"HTTP {response.status_code}: {response.text}"
+                        failed_names.append(name)
+                pending = failed_names
+            return deleted, [(name, errors[name], attempts) for name in pending]
+
+        batches = [blob_names[i:i + _MAX_BATCH_SIZE] for i in range(0, len(blob_names), _MAX_BATCH_SIZE)]
+        if batches:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as executor:
+                for deleted, failures in executor.map(delete_batch, batches):
+                    result.deleted.extend(deleted)
+                    for name, error, attempts in failures:
+                        print(f" --> [刪除失敗] \n --> 遠端檔案：{name} \n --> 錯誤：{error} \n")
+                        result.failed.append(TRANSFER_FAILURE(name, "", error, attempts))
+
+        for name in blob_names:
+            self._invalidate_listing(name)
+        result.elapsed = time.monotonic() - start_time
+        return result
 
     def delete_remote_file(self, remote_file, mode=_PYTHON):
         """ 刪除遠端檔案 """
@@ -125,11 +840,15 @@ class GCS_Manager:
         elif mode == _COMMAND_LINE:
             os.system(f"gsutil -m rm -f gs://{self.bucket_name}/{remote_file}")
             print(f" --> [刪除檔案] \n --> 遠端檔案：{remote_file} \n")
+        self._invalidate_listing(remote_file)
 
     def set_bucket(self, new_bucket_name):
         """ 設定成新的 bucket """
         self.bucket_name = new_bucket_name
-        self.bucket = self.client.bucket(self.bucket_name)
+        self.bucket = get_storage_backend().get_bucket(self.bucket_name, self.project)
+        # 列表索引屬於舊的 bucket, 需要重建
+        if self._listing_index is not None:
+            self._listing_index = _Listing_Index(self._listing_index.ttl)
         print(f"GCS Bucket changed to {self.bucket_name}")
 
     def print_GCS_info(self):
@@ -138,6 +857,7 @@ class GCS_Manager:
         print(f" ＊ Bucket name: {self.bucket_name}")
         print(f" ＊ Client: {self.client}")
         print(f" ＊ Bucket: {self.bucket}")
+        print(f" ＊ Client registry: {get_storage_backend().stats()}")
 
     def get_bucket(self):
         """ 取得 bucket """
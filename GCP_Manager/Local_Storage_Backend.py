@@ -0,0 +1,403 @@
+from GCP_Manager.GCS_Manager import _file_crc32c, _file_md5, google_crc32c # type: ignore
+import io
+import os
+import shutil
+import threading
+import time
+import uuid
+
+# 讀寫本地檔案的區塊大小
+_COPY_BLOCK_SIZE = 1024 * 1024
+
+class Local_Storage_Error(Exception):
+    """ 本地 backend 的錯誤, code 與 GCS 的 HTTP status 相同 (404, 412) """
+
+    def __init__(self, code, message):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+class Local_Storage_Backend:
+
+    """
+        本地檔案系統模擬的 GCS backend, 不需要真正的 bucket 就可以測試和量測 GCS_Manager / CRL_Manager
+
+        ＊ 物件存在 root_dir/bucket名稱/物件路徑, metadata (generation, crc32c, md5) 存在記憶體;
+          建構時會掃描 root_dir 中已存在的檔案
+        ＊ latency: 每個 request 額外等待的秒數; bandwidth: 每個 request 的傳輸速度上限 (bytes/秒), None 為不限制
+        ＊ 支援 generation 條件 (if_generation_match), 條件不符時拋出 code 412 的錯誤, 物件不存在時為 404
+        ＊ stats() 回傳 request 數量和傳輸的 bytes
+        ＊ 只支援 python mode, command_line mode 仍會呼叫 gsutil
+
+        Usage:
+            1. 建構 backend = Local_Storage_Backend(root_dir=本地資料夾, latency=0.02, bandwidth=100 * 1024 ** 2)
+            2. 切換 from GCP_Manager.GCS_Manager import set_storage_backend; set_storage_backend(backend)
+            3. 之後建立的 GCS_Manager (包含 CRL_Manager 內部使用的) 都會讀寫本地資料夾
+            4. 結束時 set_storage_backend(None) 回到 GCS
+    """
+
+    def __init__(self, root_dir, latency=0.0, bandwidth=None):
+        """ 建構式 """
+        self.root_dir = root_dir
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._objects = {}
+        self._buckets = {}
+        self._client = _Local_Client(self)
+        self._stats = {"requests": 0, "bytes_read": 0, "bytes_written": 0}
+        os.makedirs(root_dir, exist_ok=True)
+        self._scan()
+
+    # GCS_Manager 使用的 backend 介面
+    def get_client(self, project=None):
+        return self._client
+
+    def get_bucket(self, bucket_name, project=None):
+        with self._lock:
+            bucket = self._buckets.get(bucket_name)
+            if bucket is None:
+                bucket = _Local_Bucket(self, bucket_name)
+                self._buckets[bucket_name] = bucket
+            return bucket
+
+    def batch(self, client):
+        return _Local_Batch(self)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def clear(self):
+        """ 刪除所有物件 """
+        with self._lock:
+            self._objects.clear()
+        for entry in os.scandir(self.root_dir):
+            if entry.is_dir():
+                shutil.rmtree(entry.path)
+
+    # 模擬網路
+    def _request(self, n_bytes=0, direction="bytes_read"):
+        """ 模擬一個 request 的延遲和傳輸時間 """
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats[direction] += n_bytes
+        delay = self.latency
+        if self.bandwidth:
+            delay += n_bytes / self.bandwidth
+        if delay > 0:
+            time.sleep(delay)
+
+    # 物件 metadata
+    def _path(self, bucket_name, name):
+        return os.path.join(self.root_dir, bucket_name, name)
+
+    def _metadata(self, bucket_name, name):
+        with self._lock:
+            metadata = self._objects.get((bucket_name, name))
+            return dict(metadata) if metadata is not None else None
+
+    def _check_generation(self, bucket_name, name, if_generation_match):
+        """ if_generation_match: None 不檢查, 0 表示物件必須不存在 """
+        if if_generation_match is None:
+            return
+        metadata = self._objects.get((bucket_name, name))
+        generation = metadata["generation"] if metadata is not None else 0
+        if generation != if_generation_match:
+            raise Local_Storage_Error(412, f"gs://{bucket_name}/{name} generation 為 {generation}, 條件為 {if_generation_match}")
+
+    def _commit(self, bucket_name, name, tmp_path, if_generation_match=None):
+        """ 將暫存檔放到物件路徑並更新 metadata """
+        md5 = _file_md5(tmp_path)
+        crc32c = _file_crc32c(tmp_path) if google_crc32c is not None else None
+        size = os.path.getsize(tmp_path)
+        path = self._path(bucket_name, name)
+        with self._lock:
+            try:
+                self._check_generation(bucket_name, name, if_generation_match)
+            except Local_Storage_Error:
+                os.remove(tmp_path)
+                raise
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+            self._generation += 1
+            self._objects[(bucket_name, name)] = {"size": size, "generation": self._generation, "md5_hash": md5, "crc32c": crc32c}
+
+    def _tmp_path(self, bucket_name):
+        tmp_dir = os.path.join(self.root_dir, ".tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        return os.path.join(tmp_dir, f"{bucket_name}.{uuid.uuid4().hex}")
+
+    def _delete(self, bucket_name, name, if_generation_match=None):
+        with self._lock:
+            if (bucket_name, name) not in self._objects:
+                raise Local_Storage_Error(404, f"gs://{bucket_name}/{name} 不存在")
+            self._check_generation(bucket_name, name, if_generation_match)
+            del self._objects[(bucket_name, name)]
+            os.remove(self._path(bucket_name, name))
+
+    def _list(self, bucket_name, prefix):
+        with self._lock:
+            names = sorted(name for (bucket, name) in self._objects if bucket == bucket_name and name.startswith(prefix or ""))
+        return names
+
+    def _scan(self):
+        """ 載入 root_dir 中已存在的物件 """
+        for bucket_entry in os.scandir(self.root_dir):
+            if not bucket_entry.is_dir() or bucket_entry.name.startswith("."):
+                continue
+            for root, _, files in os.walk(bucket_entry.path):
+                for file_name in files:
+                    path = os.path.join(root, file_name)
+                    name = os.path.relpath(path, bucket_entry.path).replace(os.sep, "/")
+                    self._generation += 1
+                    self._objects[(bucket_entry.name, name)] = {
+                        "size": os.path.getsize(path),
+                        "generation": self._generation,
+                        "md5_hash": _file_md5(path),
+                        "crc32c": _file_crc32c(path) if google_crc32c is not None else None,
+                    }
+
+class _Local_Client:
+    """ 對應 storage.Client """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.project = "local"
+
+    def __repr__(self):
+        return f"<Local_Storage_Backend client {self.backend.root_dir}>"
+
+class _Local_Bucket:
+    """ 對應 storage.Bucket (GCS_Manager 用到的部分) """
+
+    def __init__(self, backend, name):
+        self.backend = backend
+        self.name = name
+        self.client = backend.get_client()
+
+    def __repr__(self):
+        return f"<Local bucket {self.name}>"
+
+    def blob(self, name):
+        return _Local_Blob(self, name)
+
+    def get_blob(self, name):
+        blob = _Local_Blob(self, name)
+        try:
+            blob.reload()
+        except Local_Storage_Error as e:
+            if e.code == 404:
+                return None
+            raise
+        return blob
+
+    def list_blobs(self, prefix=None, fields=None, page_size=1000, max_results=None):
+        """ 逐頁列出物件, 每頁算一個 request """
+        names = self.backend._list(self.name, prefix)
+        if max_results is not None:
+            names = names[:max_results]
+        page_size = page_size or 1000
+        for start in range(0, max(len(names), 1), page_size):
+            self.backend._request()
+            for name in names[start:start + page_size]:
+                blob = _Local_Blob(self, name)
+                if blob._load(self.backend._metadata(self.name, name)):
+                    yield blob
+
+    def delete_blob(self, name, if_generation_match=None):
+        batch = _Local_Batch.current(self.backend)
+        if batch is not None:
+            batch.record(lambda: self.backend._delete(self.name, name, if_generation_match))
+            return
+        self.backend._request()
+        self.backend._delete(self.name, name, if_generation_match)
+
+class _Local_Blob:
+    """ 對應 storage.Blob (GCS_Manager 用到的部分) """
+
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.size = None
+        self.generation = None
+        self.md5_hash = None
+        self.crc32c = None
+        self.content_encoding = None
+
+    @property
+    def _backend(self):
+        return self.bucket.backend
+
+    @property
+    def _path(self):
+        return self._backend._path(self.bucket.name, self.name)
+
+    def _load(self, metadata):
+        if metadata is None:
+            return False
+        self.size = metadata["size"]
+        self.generation = metadata["generation"]
+        self.md5_hash = metadata["md5_hash"]
+        self.crc32c = metadata["crc32c"]
+        return True
+
+    def _require(self, if_generation_match=None):
+        metadata = self._backend._metadata(self.bucket.name, self.name)
+        if metadata is None:
+            raise Local_Storage_Error(404, f"gs://{self.bucket.name}/{self.name} 不存在")
+        if if_generation_match is not None and metadata["generation"] != if_generation_match:
+            raise Local_Storage_Error(412, f"gs://{self.bucket.name}/{self.name} generation 為 {metadata['generation']}, 條件為 {if_generation_match}")
+        return metadata
+
+    def reload(self):
+        self._backend._request()
+        self._load(self._require())
+
+    def exists(self):
+        self._backend._request()
+        return self._backend._metadata(self.bucket.name, self.name) is not None
+
+    def delete(self, if_generation_match=None):
+        self._backend._request()
+        self._backend._delete(self.bucket.name, self.name, if_generation_match)
+
+    # 下載
+    def download_to_filename(self, filename, if_generation_match=None, **kwargs):
+        metadata = self._require(if_generation_match)
+        self._backend._request(metadata["size"], "bytes_read")
+        os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+        shutil.copyfile(self._path, filename)
+
+    def download_to_file(self, file_obj, start=None, end=None, checksum=None, if_generation_match=None, **kwargs):
+        """ start / end 與 GCS 相同, end 為包含的位置 """
+        metadata = self._require(if_generation_match)
+        start = start or 0
+        end = metadata["size"] - 1 if end is None else min(end, metadata["size"] - 1)
+        remaining = max(0, end - start + 1)
+        self._backend._request(remaining, "bytes_read")
+        with open(self._path, 'rb') as source:
+            source.seek(start)
+            while remaining > 0:
+                block = source.read(min(_COPY_BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                file_obj.write(block)
+                remaining -= len(block)
+
+    def download_as_bytes(self, if_generation_match=None, **kwargs):
+        metadata = self._require(if_generation_match)
+        self._backend._request(metadata["size"], "bytes_read")
+        with open(self._path, 'rb') as source:
+            return source.read()
+
+    # 上傳
+    def upload_from_filename(self, filename, if_generation_match=None, **kwargs):
+        tmp_path = self._backend._tmp_path(self.bucket.name)
+        shutil.copyfile(filename, tmp_path)
+        self._backend._request(os.path.getsize(tmp_path), "bytes_written")
+        self._backend._commit(self.bucket.name, self.name, tmp_path, if_generation_match)
+
+    def upload_from_file(self, file_obj, size=None, if_generation_match=None, **kwargs):
+        tmp_path = self._backend._tmp_path(self.bucket.name)
+        with open(tmp_path, 'wb') as target:
+            remaining = size
+            while remaining is None or remaining > 0:
+                block = file_obj.read(_COPY_BLOCK_SIZE if remaining is None else min(_COPY_BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                target.write(block)
+                if remaining is not None:
+                    remaining -= len(block)
+        self._backend._request(os.path.getsize(tmp_path), "bytes_written")
+        self._backend._commit(self.bucket.name, self.name, tmp_path, if_generation_match)
+
+    def upload_from_string(self, data, content_type=None, if_generation_match=None, **kwargs):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.upload_from_file(io.BytesIO(data), size=len(data), if_generation_match=if_generation_match)
+
+    def compose(self, sources, if_generation_match=None, **kwargs):
+        tmp_path = self._backend._tmp_path(self.bucket.name)
+        with open(tmp_path, 'wb') as target:
+            for source in sources:
+                source._require()
+                with open(source._path, 'rb') as source_file:
+                    shutil.copyfileobj(source_file, target, _COPY_BLOCK_SIZE)
+        # compose 在伺服器端完成, 不計傳輸量
+        self._backend._request()
+        self._backend._commit(self.bucket.name, self.name, tmp_path, if_generation_match)
+
+    # 串流
+    def open(self, mode="r", chunk_size=None, encoding=None, ignore_flush=False, content_type=None, **kwargs):
+        if mode in ("r", "rb", "rt"):
+            metadata = self._require()
+            self._backend._request(metadata["size"], "bytes_read")
+            reader = open(self._path, 'rb')
+            return io.TextIOWrapper(reader, encoding=encoding or "utf-8") if mode != "rb" else reader
+        if mode in ("w", "wb", "wt"):
+            writer = _Local_Writer(self)
+            return io.TextIOWrapper(io.BufferedWriter(writer), encoding=encoding or "utf-8") if mode != "wb" else writer
+        raise ValueError(f"不支援的模式 {mode}")
+
+class _Local_Writer(io.RawIOBase):
+    """ 寫到暫存檔, close 時才成為物件 (與 resumable upload 相同) """
+
+    def __init__(self, blob):
+        self.blob = blob
+        self._tmp_path = blob._backend._tmp_path(blob.bucket.name)
+        self._file = open(self._tmp_path, 'wb')
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self._file.write(data)
+
+    def close(self):
+        if self.closed:
+            return
+        self._file.close()
+        backend = self.blob._backend
+        backend._request(os.path.getsize(self._tmp_path), "bytes_written")
+        backend._commit(self.blob.bucket.name, self.blob.name, self._tmp_path)
+        super().close()
+
+class _Local_Response:
+    """ 對應 batch request 中單一子請求的回應 """
+
+    def __init__(self, status_code, text=""):
+        self.status_code = status_code
+        self.text = text
+
+class _Local_Batch:
+    """ 對應 Batch: with 區塊中的刪除會被記錄, 整批只算一個 request """
+
+    _active = threading.local()
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.responses = []
+
+    @classmethod
+    def current(cls, backend):
+        batch = getattr(cls._active, "batch", None)
+        return batch if batch is not None and batch.backend is backend else None
+
+    def record(self, operation):
+        try:
+            operation()
+            self.responses.append(_Local_Response(204))
+        except Local_Storage_Error as e:
+            self.responses.append(_Local_Response(e.code, str(e)))
+
+    def __enter__(self):
+        _Local_Batch._active.batch = self
+        return self
+
+    def __exit__(self, *exc_info):
+        _Local_Batch._active.batch = None
+        self.backend._request()
+
+if __name__ == "__main__":
+    help(Local_Storage_Backend)
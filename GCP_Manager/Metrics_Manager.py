@@ -0,0 +1,128 @@
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, List
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+class Metrics_Manager:
+
+    """
+        收集分析流程的 metrics (各階段耗時、傳輸量、CLI 資源用量), 以 JSON lines 或 hook 輸出
+
+        ＊ 每筆 metrics 是一個 dict, 包含 timestamp, job_id, event 和各事件的欄位:
+            - stage: 各階段 (download, parse, execute, upload, 以及整個流程 run) 的 wall_time 和 success
+            - transfer: 每個 FILES_IO 的 bytes, elapsed, throughput (bytes/秒)
+            - cli: CLI 的 returncode, wall_time, cpu_user, cpu_system, peak_rss_kb
+        ＊ CLI 的 CPU 時間和 peak RSS 以 os.wait4 取得, 只包含這個 CLI 和它的子程序 (同時執行的其他 CLI 或 gsutil 不會算進來);
+          沒有 os.wait4 的平台只記錄 returncode 和 wall_time
+
+        Usage:
+            1. 建構 metrics = Metrics_Manager(jsonl_path=輸出路徑 ('-' 為 stdout), job_id=任務名稱)
+            2. 加入 hook metrics.add_hook(lambda record: ...)
+            3. 交給 CRL_Manager(config_content, script_content, metrics=metrics)
+            4. 自行記錄 with metrics.stage("download"): ... 或 metrics.emit("custom", key=value)
+    """
+
+    def __init__(self, jsonl_path: str = None, hooks: List[Callable[[dict], None]] = None, job_id: str = None):
+        """ 建構式 """
+        self.jsonl_path = jsonl_path
+        self.job_id = job_id
+        self.hooks = list(hooks) if hooks else []
+        self.records = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook: Callable[[dict], None]):
+        """ 加入 metrics hook, 每筆 metrics 都會呼叫 hook(record) """
+        self.hooks.append(hook)
+
+    def emit(self, event: str, **fields):
+        """ 輸出一筆 metrics """
+        record = {"timestamp": datetime.now().isoformat(), "job_id": self.job_id, "event": event}
+        record.update(fields)
+        with self._lock:
+            self.records.append(record)
+            if self.jsonl_path == "-":
+                print(json.dumps(record, ensure_ascii=False, default=str), file=sys.stdout, flush=True)
+            elif self.jsonl_path:
+                with open(self.jsonl_path, 'a') as file:
+                    file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        for hook in self.hooks:
+            try:
+                hook(record)
+            except Exception as e:
+                print(f" --> [metrics] hook 執行失敗: {e}")
+        return record
+
+    @contextmanager
+    def stage(self, name: str, **fields):
+        """ 記錄一個階段的 wall time; 可在 with 區塊中修改回傳的 dict (例如 success=False) """
+        info = {"success": True}
+        info.update(fields)
+        start_time = time.monotonic()
+        try:
+            yield info
+        except BaseException:
+            info["success"] = False
+            raise
+        finally:
+            self.emit("stage", stage=name, wall_time=time.monotonic() - start_time, **info)
+
+    def transfer(self, direction: str, gcs_uri: str, local_path: str, n_bytes: int, elapsed: float, success: bool, attempts: int = 1):
+        """ 記錄單一 FILES_IO 的傳輸量和速度 """
+        return self.emit(
+            "transfer", direction=direction, gcs_uri=gcs_uri, local_path=local_path,
+            bytes=n_bytes, elapsed=elapsed, throughput=(n_bytes / elapsed) if elapsed > 0 else None,
+            success=success, attempts=attempts,
+        )
+
+    def measure_cli(self, process: subprocess.Popen, start_time: float = None):
+        """ 等待 CLI process 結束並記錄它的 wall time、CPU 時間和 peak RSS, 回傳 returncode """
+        start_time = time.monotonic() if start_time is None else start_time
+        returncode, usage = None, None
+        try:
+            returncode, usage = _wait_with_rusage(process)
+            return returncode
+        finally:
+            self.emit(
+                "cli", returncode=returncode, wall_time=time.monotonic() - start_time,
+                cpu_user=usage.ru_utime if usage is not None else None,
+                cpu_system=usage.ru_stime if usage is not None else None,
+                peak_rss_kb=usage.ru_maxrss if usage is not None else None,
+            )
+
+    def summary(self):
+        """ 回傳各階段耗時和傳輸總量 """
+        with self._lock:
+            records = list(self.records)
+        stages = {}
+        for record in records:
+            if record["event"] == "stage":
+                stages[record["stage"]] = stages.get(record["stage"], 0.0) + record["wall_time"]
+        transfers = [record for record in records if record["event"] == "transfer"]
+        return {
+            "stages": stages,
+            "bytes_downloaded": sum(record["bytes"] for record in transfers if record["direction"] == "download"),
+            "bytes_uploaded": sum(record["bytes"] for record in transfers if record["direction"] == "upload"),
+        }
+
+def _wait_with_rusage(process: subprocess.Popen):
+    """ 以 os.wait4 回收 process, 回傳 (returncode, 這個 process 和它已回收的子程序的 rusage) """
+    if not hasattr(os, "wait4"):
+        return process.wait(), None
+    try:
+        _, status, usage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        # 已經被回收 (例如其他地方呼叫過 wait)
+        return process.wait(), None
+    if os.WIFSIGNALED(status):
+        process.returncode = -os.WTERMSIG(status)
+    else:
+        process.returncode = os.WEXITSTATUS(status)
+    return process.returncode, usage
+
+if __name__ == "__main__":
+    help(Metrics_Manager)
@@ -1,3 +1,5 @@
+from __future__ import annotations
+
 # 身份驗證
 USER_NAME = 'user1'
 USER_PASSWORD = 'user1'
@@ -7,13 +9,32 @@ USER_DB = 'postgres'
 AUTO_UPGRADE = "自動更新"
 SQL_CONNECTION_NAME = 'accuinbio-core:asia-east1:db-1'
 
+# 批次插入: 每批筆數和方式 (executemany 或 PostgreSQL COPY FROM STDIN; 沒有指定時 PostgreSQL 使用 COPY)
+INSERT_CHUNK_SIZE = 5000
+INSERT_EXECUTEMANY = "executemany"
+INSERT_COPY = "copy"
+
+# 更新方式: 每個 ID 生成 UPDATE 語句, 或寫入暫存表 (staging table) 後以 UPDATE ... FROM 批次更新
+UPDATE_STATEMENTS = "statements"
+UPDATE_STAGING = "staging"
+STAGING_TABLE_NAME = "_sql_manager_staging"
+
+# 批次刪除: 每個 DELETE 語句帶入的 ID 數量
+DELETE_CHUNK_SIZE = 10000
+
+import io
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning, module='google.auth._default')
+from contextlib import contextmanager
 from datetime import datetime
-import pandas as pd
-from sqlalchemy import create_engine, text
-from google.cloud.sql.connector import Connector
 from dataclasses import dataclass
+from GCP_Manager._lazy_import import lazy_module, lazy_function # type: ignore
+
+# pandas, SQLAlchemy 和 Cloud SQL connector 在第一次使用時才載入, 縮短 import 時間
+pd = lazy_module("pandas")
+np = lazy_module("numpy")
+create_engine = lazy_function("sqlalchemy", "create_engine")
+text = lazy_function("sqlalchemy", "text")
 
 @dataclass
 class PreserveObject:
@@ -37,6 +58,14 @@ class Edit_Record:
     column_name: str
     record: str
 
+@dataclass
+class DATA_DIFF:
+    added_ids: list
+    updated_ids: list
+    deleted_ids: list
+    # index 為更新的 ID, 欄位為比較的欄位, True 表示該格有變動
+    changed_mask: pd.DataFrame
+
 class SQL_Manager:
 
     """ 說明：
@@ -62,11 +91,13 @@ class SQL_Manager:
                     trigger_name="trigger_name", 
                     switch_status=True
                 )
-            5. 表格插入新資料： 
+            5. 表格插入新資料 (同一個交易中分批寫入, method="executemany" 或 "copy")： 
                 sql_manager.Insert_New_Data(
                     added_ids=要加入的id列表, 
                     source_dataset=來源資料集, 
-                    column_of_id=id欄位名稱
+                    column_of_id=id欄位名稱,
+                    chunk_size=每批筆數,
+                    method="executemany"
                 )
             6. 執行 SQL 語句： 
                 sql_manager.Execute_SQL_Query(
@@ -120,8 +151,9 @@ class SQL_Manager:
         self._new_data_added_excel = ""
         self._illegal_symbols = [':', '&', '%s']
 
-        # 嘗試建立 SQL 連線
-        self.sql_engine = None
+        # 設定 SQL 連線 (第一次使用 sql_engine 時才建立)
+        self._sql_engine = None
+        self._connect_settings = None
         self.SQL_Connect(
             connection_name=self.sql_connection_name,
             user_name=self.user_name,
@@ -130,6 +162,16 @@ class SQL_Manager:
         )
 
 
+    # sql_engine 屬性: 第一次使用時才建立 Connector 和資料庫引擎
+    @property
+    def sql_engine(self):
+        if self._sql_engine is None and self._connect_settings is not None:
+            self._sql_engine = self._create_engine(**self._connect_settings)
+        return self._sql_engine
+    @sql_engine.setter
+    def sql_engine(self, value):
+        self._sql_engine = value
+
     # 設定非法符號
     @property
     def illegal_symbols(self):
@@ -173,7 +215,19 @@ class SQL_Manager:
             raise ValueError(f"Type Error: {params} should be {params_type}! {warning_message}")
 
     def SQL_Connect(self, connection_name:str, user_name:str, user_password:str, user_db:str):
+        """ 設定 SQL 連線, 第一次使用時才建立 """
+        self._connect_settings = dict(
+            connection_name=connection_name,
+            user_name=user_name,
+            user_password=user_password,
+            user_db=user_db,
+        )
+        self._sql_engine = None
+
+    def _create_engine(self, connection_name:str, user_name:str, user_password:str, user_db:str):
         """ 建立 SQL 連線 """
+        from google.cloud.sql.connector import Connector
+
         # Handle connection
         connector = Connector()
         def getconn():
@@ -194,10 +248,10 @@ class SQL_Manager:
                 creator=getconn
             )
             print(f" --> 成功建立連線!")
-            self.sql_engine = engine
+            return engine
         except Exception as e:
             print(f" --> 建立連線失敗! Error: {e}")
-            self.sql_engine = None
+            return None
 
     def Fetch_SQL_Data(self, db_exclude_columns = [], to_preserve:list[PreserveObject] = []):
         """ 取得 SQL 資料 """
@@ -291,62 +345,95 @@ class SQL_Manager:
         
         return query
 
-    def Insert_New_Data(self, added_ids:list, source_dataset:pd.DataFrame, column_of_id:str, effected_trigger:list[str]=[]):
-        """ 插入新資料 """
+    def Insert_New_Data(self, added_ids:list, source_dataset:pd.DataFrame, column_of_id:str, effected_trigger:list[str]=[],
+                        chunk_size:int=INSERT_CHUNK_SIZE, method:str=None):
+        """ 插入新資料, 在同一個交易中分批 (chunk_size 筆) 以 executemany 或 COPY 寫入, 回傳插入的筆數; method 預設 PostgreSQL 用 COPY """
+
+        method = method or self._default_insert_method()
+        if method not in (INSERT_EXECUTEMANY, INSERT_COPY):
+            raise ValueError(f"method 需要是 {INSERT_EXECUTEMANY} 或 {INSERT_COPY}, 但提供 {method}")
 
         print(f" --> [插入新資料] 需要插入 {len(added_ids)} 行")
         self.log_record(f" --> [插入新資料] 需要插入 {len(added_ids)} 行")
 
-        # 選取需要插入的資料
-        data_to_insert = source_dataset.loc[source_dataset[column_of_id].isin([str(id) for id in added_ids])]
-
-        # 生成 SQL 語句 
+        # 選取需要插入的資料 (每個 ID 取第一筆), 依照 added_ids 的順序, 所有數值轉成 string
+        ids_to_insert = pd.Index([str(id) for id in added_ids])
+        data_to_insert = source_dataset.loc[source_dataset[column_of_id].astype(str).isin(ids_to_insert)]
+        data_to_insert = data_to_insert.drop_duplicates(subset=column_of_id, keep="first")
+        # 與逐筆 str() 相同 (None -> "None", NaN -> "nan"), 不受 pandas 版本的 astype(str) 行為影響
+        data_to_insert = data_to_insert.astype(object).apply(lambda column: column.map(str))
+        data_to_insert = data_to_insert.set_index(column_of_id, drop=False).reindex(ids_to_insert)
+        missing_ids = ids_to_insert[data_to_insert[column_of_id].isna()]
+        if len(missing_ids) > 0:
+            raise ValueError(f"source_dataset 中找不到 ID: {missing_ids.tolist()[:10]}")
+
+        # 生成 SQL 語句 (以欄位順序命名參數, 欄位名稱有空白或大小寫重複時也不會衝突)
         column_names = [ f"\"{col}\"" for col in data_to_insert.columns.tolist()]
-        virtual_values = [ f":{vcol.lower()}" for vcol in data_to_insert.columns.tolist()]
-
-        # 對照表
-        column_to_virtual_value = dict(zip(virtual_values,column_names))
-
-        # 生成插入語句
         join_column_names = ",".join(column_names)
-        join_virtual_values = ",".join(virtual_values)
-
-        sql = f"""INSERT INTO {self.sql_table_name} ({join_column_names}) VALUES ({join_virtual_values});"""
 
         # 關閉觸發器
         for each in effected_trigger:
             self.switch_trigger(each, False)
 
-        
-        for i, each in enumerate(added_ids):
-            # 紀錄插入進度
-            self.log_record(f" --> [插入進度] 已經插入 ID: {each}")
-
-            # 選取需要插入的資料
-            selected_row = data_to_insert.loc[data_to_insert[column_of_id] == str(each)]
-
-            # 生成參數
-            params = {}
-            for each in virtual_values:
-                column_name = column_to_virtual_value[each]
-                column_name = column_name.replace("\"", "")
-                params[each.replace(":", "")] = str(selected_row[column_name].values[0])
-
+        try:
             with self.sql_engine.connect() as connection:
                 transaction = connection.begin()
-                connection.execute(text(sql), params)
-                transaction.commit()
-
-            # 每 10% 回報一次進度比例
-            if len(added_ids) > 0 and i % max(1, len(added_ids) // 10) == 0:
-                print(f" --> [插入進度] 已插入了 {i / len(added_ids) * 100:.2f}%")
-                
+                try:
+                    inserted = 0
+                    for start in range(0, len(data_to_insert), max(1, chunk_size)):
+                        chunk = data_to_insert.iloc[start:start + max(1, chunk_size)]
+                        if method == INSERT_COPY:
+                            self._copy_rows(connection, join_column_names, chunk)
+                        else:
+                            self._executemany_rows(connection, join_column_names, chunk)
+                        inserted += len(chunk)
+
+                        # 紀錄插入進度 (每批一次)
+                        self.log_record("\n".join(f" --> [插入進度] 已經插入 ID: {each}" for each in chunk[column_of_id]))
+                        print(f" --> [插入進度] 已插入了 {inserted / len(data_to_insert) * 100:.2f}% ({inserted}/{len(data_to_insert)})")
+                    transaction.commit()
+                except Exception as e:
+                    transaction.rollback()
+                    print(f" --> [插入新資料] 插入失敗, 已回滾: {e}")
+                    raise
+        finally:
+            # 開啟觸發器
+            for each in effected_trigger:
+                self.switch_trigger(each, True)
 
         print(f" --> [插入新資料] 插入完成")
         self.log_record(f" --> [插入新資料] 插入完成")
-        # 開啟觸發器
-        for each in effected_trigger:
-            self.switch_trigger(each, True)
+        return inserted
+
+    def _default_insert_method(self):
+        """ PostgreSQL 使用 COPY (pg8000 的 executemany 仍是逐筆執行), 其他資料庫使用 executemany """
+        return INSERT_COPY if self.sql_engine.dialect.name == "postgresql" else INSERT_EXECUTEMANY
+
+    def _executemany_rows(self, connection, join_column_names:str, chunk:pd.DataFrame, table_name:str=None):
+        """ 以 executemany 插入一批資料 (預設插入 sql_table_name) """
+        virtual_values = [f":p{i}" for i in range(chunk.shape[1])]
+        sql = f"""INSERT INTO {table_name or self.sql_table_name} ({join_column_names}) VALUES ({",".join(virtual_values)});"""
+        keys = [each[1:] for each in virtual_values]
+        params = [dict(zip(keys, row)) for row in chunk.itertuples(index=False, name=None)]
+        connection.execute(text(sql), params)
+
+    def _copy_rows(self, connection, join_column_names:str, chunk:pd.DataFrame, table_name:str=None):
+        """ 以 PostgreSQL COPY FROM STDIN (CSV) 插入一批資料 (預設插入 sql_table_name) """
+        buffer = io.StringIO()
+        chunk.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        # 數值都是 string, 空字串寫入空字串而不是 NULL
+        sql = f"COPY {table_name or self.sql_table_name} ({join_column_names}) FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL ({join_column_names}))"
+        cursor = connection.connection.cursor()
+        try:
+            if hasattr(cursor, "copy_expert"):
+                # psycopg2
+                cursor.copy_expert(sql, buffer)
+            else:
+                # pg8000
+                cursor.execute(sql, stream=io.BytesIO(buffer.getvalue().encode("utf-8")))
+        finally:
+            cursor.close()
 
     def Execute_SQL_Script(self, sql_script:str, substitute_objects:list[SubstituteObject]=[], sep=';'):
 
@@ -381,62 +468,15 @@ class SQL_Manager:
         print(f" --> [開始偵測] 現有資料有 {existing_data.shape[0]} 行, 新的資料有 {new_data.shape[0]} 行")
         self.log_record(f" --> [開始偵測] 現有資料有 {existing_data.shape[0]} 行, 新的資料有 {new_data.shape[0]} 行")
 
-        # 初始化記錄更新、新增、刪除的列表
-        updated_ids = []
-        added_ids = []
-        deleted_ids = []
-        preserved_ids = []
-        if preserved_data is not None and column_of_id is not None:
-            preserved_ids = preserved_data[column_of_id].tolist()
+        diff = self.Diff_Data(new_data, existing_data, column_of_id, preserved_data)
+        added_ids, updated_ids, deleted_ids = diff.added_ids, diff.updated_ids, diff.deleted_ids
 
-        # 將 new_data 和 existing_data 按照 _Uploaded_variation 排序
-        new_data.sort_values(by=column_of_id, inplace=True)
-        existing_data.sort_values(by=column_of_id, inplace=True)
-
-        # 排序欄位
-        new_data.sort_index(axis=1, inplace=True)
-        existing_data.sort_index(axis=1, inplace=True)
-
-        # 如果 existing_data 為空，直接記錄新增的 ID
         if existing_data.empty:
-            added_ids.extend(new_data[column_of_id].tolist())
             print(f" --> [首次更新] 新增了 {len(added_ids)} 行")
             self.log_record(f" --> [首次更新] 新增了 {len(added_ids)} 行")
         else:
-
-            # 取得 ID 列表
-            new_data_ids = new_data[column_of_id].tolist()
-            existing_data_ids = existing_data[column_of_id].tolist()
-
-            # 排除 preserved_ids 的資料
-            new_data_ids = [each for each in new_data_ids if each not in preserved_ids]
-            existing_data_ids = [each for each in existing_data_ids if each not in preserved_ids]
-
-            # 做差集看哪些 ID 需要新增
-            added_ids = list(set(new_data_ids) - set(existing_data_ids))
-
-            # 做差集看哪些 ID 需要刪除
-            deleted_ids = list(set(existing_data_ids) - set(new_data_ids))
-
-            # 做交集看哪些 ID 需要更新
-            updated_ids = set(new_data_ids) & set(existing_data_ids)
-            select_new_df = new_data.loc[new_data[column_of_id].isin(updated_ids)]
-            select_existing_df = existing_data.loc[existing_data[column_of_id].isin(updated_ids)]
-
-            # 將 select_new_df 和 select_existing_df 數值全部轉換成 string
-            select_new_df = select_new_df.astype(str)
-            select_existing_df = select_existing_df.astype(str)
-
-            # 比較差異
-            diff = pd.concat([select_existing_df, select_new_df]).drop_duplicates(keep=False)
-            diff.sort_values(by=column_of_id, inplace=True)
-            updated_ids = list(set(diff[column_of_id].tolist()))
-
             # Write message
-            log_message = ""
-            for each in added_ids:
-                log_message += f"\n--> [新增資料] uniq_identifier: {each}"
-            self.log_record(f"{log_message}")
+            self.log_record("".join(f"\n--> [新增資料] uniq_identifier: {each}" for each in added_ids))
         
         # 回報偵測結果
         print(f" --> [偵測完畢] 新增了 {len(added_ids)} 行, 更新了 {len(updated_ids)} 行, 刪除了 {len(deleted_ids)} 行")
@@ -445,6 +485,45 @@ class SQL_Manager:
         # 回傳結果
         return added_ids, updated_ids, deleted_ids
 
+    def Diff_Data(self, new_data:pd.DataFrame, existing_data:pd.DataFrame, column_of_id:str, preserved_data:pd.DataFrame = None):
+
+        """ 以 column_of_id 對齊新舊資料, 用 row hash 找出有變動的 ID 再計算每格的變動, 不修改傳入的 dataframe """
+
+        # 比較的欄位 (兩邊欄位的聯集, 只有一邊有的欄位視為有變動)
+        columns = sorted((set(new_data.columns) | set(existing_data.columns)) - {column_of_id})
+
+        # 如果 existing_data 為空，全部都是新增的 ID
+        if existing_data.empty:
+            return DATA_DIFF(new_data[column_of_id].tolist(), [], [], pd.DataFrame(columns=columns, dtype=bool))
+
+        # 排除 preserved_ids 的資料, 以 ID 為 index (同一個 ID 有多筆時取第一筆)
+        preserved_ids = preserved_data[column_of_id] if preserved_data is not None and column_of_id is not None else []
+        def align(frame):
+            frame = frame.loc[~frame[column_of_id].isin(preserved_ids)]
+            return frame.drop_duplicates(subset=column_of_id, keep="first").set_index(column_of_id)
+        new_frame = align(new_data)
+        existing_frame = align(existing_data)
+
+        # 新增、刪除和兩邊都有的 ID
+        added_ids = new_frame.index.difference(existing_frame.index, sort=False)
+        deleted_ids = existing_frame.index.difference(new_frame.index, sort=False)
+        common_ids = new_frame.index.intersection(existing_frame.index, sort=False)
+
+        # 數值全部轉換成 string 後以 row hash 比較, 只有 hash 不同的列才逐格比較
+        new_common = _stringify_columns(new_frame.reindex(common_ids), columns)
+        existing_common = _stringify_columns(existing_frame.reindex(common_ids), columns)
+        new_hash = pd.util.hash_pandas_object(new_common, index=False).to_numpy()
+        existing_hash = pd.util.hash_pandas_object(existing_common, index=False).to_numpy()
+        candidates = new_hash != existing_hash
+
+        new_values = new_common.to_numpy()[candidates]
+        existing_values = existing_common.to_numpy()[candidates]
+        changed = (new_values != existing_values) & ~(pd.isna(new_values) & pd.isna(existing_values))
+        changed_mask = pd.DataFrame(changed, index=common_ids[candidates], columns=columns)
+        changed_mask = changed_mask.loc[changed_mask.any(axis=1)]
+
+        return DATA_DIFF(added_ids.tolist(), changed_mask.index.tolist(), deleted_ids.tolist(), changed_mask)
+
     def Generate_Update_SQL_Statements(self, updated_ids, existing_data, new_data, column_of_id:str, added_cols:list[str]=[], removed_cols:list[str]=[]):
 
         def Generate_Update_SQL(table_name, updated_columns, target_id):
@@ -473,40 +552,146 @@ class SQL_Manager:
 
             return sql
 
-        # 將 existing_data 和 new_data 的 ID column 轉換成 string
-        existing_data[column_of_id] = existing_data[column_of_id].astype(str)
-        new_data[column_of_id] = new_data[column_of_id].astype(str)
-
         # 生成更新語句
         sql_statements = []
-        for each in updated_ids:
-            old_data = existing_data.loc[existing_data[column_of_id] == str(each)]
-            t_new_data = new_data.loc[new_data[column_of_id] == str(each)]
-
-            # 決定搜索欄位範圍 如果 added_cols 和 removed_cols 則增減搜索欄位
-            search_columns = old_data.columns.tolist()
-            if len(added_cols) > 0:
-                search_columns.extend(added_cols)
-            if len(removed_cols) > 0:
-                search_columns = [each for each in search_columns if each not in removed_cols]
-
-            # 找出不同的欄位
-            different_columns = []
-            for column in search_columns:
-                old_value = str(old_data[column].values[0]).strip() if column in old_data.columns.tolist() else ""
-                new_value = str(t_new_data[column].values[0]).strip() if column in t_new_data.columns.tolist() else ""
-                
-                # 如果舊值和新值不同，則記錄
-                if old_value != new_value:
-                    update = Updated_Column(column_name=column, old_value=old_value, new_value=new_value)
-                    different_columns.append(update)
-            
-            # 如果不同的欄位存在，則生成更新語句
-            if different_columns:
-                sql_statements.append(Generate_Update_SQL(self.sql_table_name, different_columns, each))
+        for each, different_columns in self.Find_Updated_Columns(updated_ids, existing_data, new_data, column_of_id, added_cols, removed_cols):
+            sql_statements.append(Generate_Update_SQL(self.sql_table_name, different_columns, each))
 
         return sql_statements
 
+    def Find_Updated_Columns(self, updated_ids, existing_data:pd.DataFrame, new_data:pd.DataFrame, column_of_id:str, added_cols:list[str]=[], removed_cols:list[str]=[]):
+        """ 以 ID 對齊新舊資料並一次比較所有欄位, 依序產生 (ID, 有變動的 Updated_Column 列表); 不修改傳入的 dataframe """
+
+        # 決定搜索欄位範圍 如果 added_cols 和 removed_cols 則增減搜索欄位
+        search_columns = list(dict.fromkeys(existing_data.columns.tolist() + list(added_cols)))
+        search_columns = [column for column in search_columns if column not in removed_cols]
+
+        # 取出每個 ID 的數值 (str 並去除前後空白, 沒有的欄位為 ""), 比較出有變動的格子
+        updated_ids = list(updated_ids)
+        target_ids = [str(each) for each in updated_ids]
+        old_values = _aligned_string_values(existing_data, column_of_id, target_ids, search_columns)
+        new_values = _aligned_string_values(new_data, column_of_id, target_ids, search_columns)
+        changed = old_values != new_values
+
+        for row in np.flatnonzero(changed.any(axis=1)):
+            yield updated_ids[row], [
+                Updated_Column(column_name=search_columns[col], old_value=old_values[row, col], new_value=new_values[row, col])
+                for col in np.flatnonzero(changed[row])
+            ]
+
+    def Apply_Updates(self, updated_ids, existing_data:pd.DataFrame, new_data:pd.DataFrame, column_of_id:str,
+                      added_cols:list[str]=[], removed_cols:list[str]=[], effected_trigger:list[str]=[],
+                      chunk_size:int=INSERT_CHUNK_SIZE, method:str=None):
+        """ 將有變動的格子寫入暫存表 (method 預設 PostgreSQL 使用 COPY), 依變動的欄位分組以 UPDATE ... FROM 在同一個交易中更新
+            (包含 Modify_date 和 Modify_record), 回傳更新的筆數 """
+
+        method = method or self._default_insert_method()
+        if method not in (INSERT_EXECUTEMANY, INSERT_COPY):
+            raise ValueError(f"method 需要是 {INSERT_EXECUTEMANY} 或 {INSERT_COPY}, 但提供 {method}")
+
+        staging = self._prepare_staging(updated_ids, existing_data, new_data, column_of_id, added_cols, removed_cols)
+        if staging is None:
+            return 0
+        with self._transaction(effected_trigger, "批次更新") as connection:
+            updated = self._update_from_staging(connection, staging, column_of_id, chunk_size, method)
+
+        print(f" --> [批次更新] 更新完成, 共更新 {updated} 行")
+        self.log_record(f" --> [批次更新] 更新完成, 共更新 {updated} 行")
+        return updated
+
+    @contextmanager
+    def _transaction(self, effected_trigger:list[str], label:str):
+        """ 關閉觸發器並開始交易, 結束時提交 (失敗時回滾) 並開啟觸發器 """
+
+        # 關閉觸發器
+        for each in effected_trigger:
+            self.switch_trigger(each, False)
+
+        try:
+            with self.sql_engine.connect() as connection:
+                transaction = connection.begin()
+                try:
+                    yield connection
+                    transaction.commit()
+                except Exception as e:
+                    transaction.rollback()
+                    print(f" --> [{label}] 執行失敗, 已回滾: {e}")
+                    raise
+        finally:
+            # 開啟觸發器
+            for each in effected_trigger:
+                self.switch_trigger(each, True)
+
+    def _prepare_staging(self, updated_ids, existing_data:pd.DataFrame, new_data:pd.DataFrame, column_of_id:str,
+                         added_cols:list[str], removed_cols:list[str]):
+        """ 找出有變動的格子並依變動的欄位分組, 回傳 (暫存表資料, {變動欄位: 組別}, {欄位: 暫存表欄位}); 沒有變動時回傳 None """
+
+        changes = list(self.Find_Updated_Columns(updated_ids, existing_data, new_data, column_of_id, added_cols, removed_cols))
+        print(f" --> [批次更新] 需要更新 {len(changes)} 行")
+        self.log_record(f" --> [批次更新] 需要更新 {len(changes)} 行")
+        if not changes:
+            return None
+
+        changed_columns = list(dict.fromkeys(update.column_name for _, updated_columns in changes for update in updated_columns))
+        staging_columns = {column: f"c{i}" for i, column in enumerate(changed_columns)}
+        modify_date = datetime.now().strftime("%Y-%m-%d %H:%M")
+        groups = {}
+        rows = []
+        for target_id, updated_columns in changes:
+            group = groups.setdefault(tuple(update.column_name for update in updated_columns), len(groups))
+            values = dict.fromkeys(staging_columns.values(), "")
+            for update in updated_columns:
+                values[staging_columns[update.column_name]] = update.new_value
+            changes_message = [f"{update.column_name} 從 {update.old_value} 更新到 {update.new_value};" for update in updated_columns]
+            rows.append({"_id": str(target_id), "_group": str(group), "_modify_date": modify_date, "_modify_record": "\n".join(["已更新:", *changes_message]), **values})
+            self.log_record(f" --> [更新資料] {target_id} 更新了, " + "".join(changes_message))
+        staging_data = pd.DataFrame(rows, columns=["_id", "_group", "_modify_date", "_modify_record", *staging_columns.values()])
+        return staging_data, groups, staging_columns
+
+    def _update_from_staging(self, connection, staging, column_of_id:str, chunk_size:int=INSERT_CHUNK_SIZE, method:str=None):
+        """ 在 connection 的交易中建立並寫入暫存表, 每組變動欄位執行一次 UPDATE ... FROM, 回傳更新的筆數 """
+
+        staging_data, groups, staging_columns = staging
+        method = method or self._default_insert_method()
+        staging_column_names = [f"\"{col}\"" for col in staging_data.columns]
+        join_staging_columns = ",".join(staging_column_names)
+
+        # 暫存表的數值都是 TEXT, 更新時轉換成原本欄位的型別
+        column_types = self._column_types(connection, [column_of_id, "Modify_date", "Modify_record", *staging_columns])
+
+        # 寫入暫存表
+        connection.execute(text(f"CREATE TEMP TABLE {STAGING_TABLE_NAME} ({', '.join(col + ' TEXT' for col in staging_column_names)}) ON COMMIT DROP"))
+        for start in range(0, len(staging_data), max(1, chunk_size)):
+            chunk = staging_data.iloc[start:start + max(1, chunk_size)]
+            if method == INSERT_COPY:
+                self._copy_rows(connection, join_staging_columns, chunk, table_name=STAGING_TABLE_NAME)
+            else:
+                self._executemany_rows(connection, join_staging_columns, chunk, table_name=STAGING_TABLE_NAME)
+        connection.execute(text(f"ANALYZE {STAGING_TABLE_NAME}"))
+
+        # 每組變動欄位執行一次 UPDATE ... FROM
+        updated = 0
+        for columns, group in groups.items():
+            set_clauses = [f"\"{col}\" = CAST(s.\"{staging_columns[col]}\" AS {column_types[col]})" for col in columns]
+            set_clauses.append(f"\"Modify_date\" = CAST(s.\"_modify_date\" AS {column_types['Modify_date']})")
+            set_clauses.append(f"\"Modify_record\" = CAST(s.\"_modify_record\" AS {column_types['Modify_record']})")
+            sql = (f"UPDATE {_quote_identifier(self.sql_table_name)} AS t SET {', '.join(set_clauses)} FROM {STAGING_TABLE_NAME} AS s "
+                   f"WHERE t.\"{column_of_id}\" = CAST(s.\"_id\" AS {column_types[column_of_id]}) AND s.\"_group\" = :group")
+            updated += connection.execute(text(sql), {"group": str(group)}).rowcount
+        return updated
+
+    def _column_types(self, connection, columns:list[str]):
+        """ 查詢 sql_table_name 欄位的 PostgreSQL 型別 (表格名稱加上引號, 與 UPDATE / DELETE 語句指向同一個表格) """
+        query = connection.execute(text(
+            "SELECT attname, format_type(atttypid, atttypmod) FROM pg_attribute "
+            "WHERE attrelid = CAST(:table_name AS regclass) AND attnum > 0 AND NOT attisdropped"
+        ), {"table_name": _quote_identifier(self.sql_table_name)})
+        column_types = dict(query.fetchall())
+        missing = [column for column in columns if column not in column_types]
+        if missing:
+            raise ValueError(f"{self.sql_table_name} 沒有欄位: {missing}")
+        return column_types
+
     def Generate_Delete_SQL_Statements(self, deleted_ids, column_of_id:str):
         # 生成刪除語句
         sql_statements = []
@@ -516,12 +701,45 @@ class SQL_Manager:
             self.log_record(f" --> [刪除資料] 刪除了 {id_to_delete}")
         return sql_statements
 
+    def Delete_Data(self, deleted_ids, column_of_id:str, effected_trigger:list[str]=[], chunk_size:int=DELETE_CHUNK_SIZE):
+        """ 以 ID 陣列參數 (WHERE id = ANY(:ids)) 批次刪除, 每 chunk_size 個 ID 一個語句, 在同一個交易中執行, 回傳刪除的筆數 """
+
+        ids_to_delete = _unique_ids(deleted_ids)
+        print(f" --> [批次刪除] 需要刪除 {len(ids_to_delete)} 行")
+        self.log_record(f" --> [批次刪除] 需要刪除 {len(ids_to_delete)} 行")
+        if not ids_to_delete:
+            return 0
+        with self._transaction(effected_trigger, "批次刪除") as connection:
+            deleted = self._delete_by_ids(connection, ids_to_delete, column_of_id, chunk_size)
+
+        print(f" --> [批次刪除] 刪除完成, 共刪除 {deleted} 行")
+        self.log_record(f" --> [批次刪除] 刪除完成, 共刪除 {deleted} 行")
+        return deleted
+
+    def _delete_by_ids(self, connection, ids_to_delete:list[str], column_of_id:str, chunk_size:int=DELETE_CHUNK_SIZE):
+        """ 在 connection 的交易中分批刪除, 回傳刪除的筆數 """
+
+        # ID 以 text[] 傳入, 轉換成 ID 欄位的型別以使用索引
+        id_type = self._column_types(connection, [column_of_id])[column_of_id]
+        sql = f"DELETE FROM {_quote_identifier(self.sql_table_name)} WHERE \"{column_of_id}\" = ANY(CAST(:ids AS {id_type}[]))"
+        deleted = 0
+        for start in range(0, len(ids_to_delete), max(1, chunk_size)):
+            chunk = ids_to_delete[start:start + max(1, chunk_size)]
+            deleted += connection.execute(text(sql), {"ids": chunk}).rowcount
+            self.log_record("\n".join(f" --> [刪除資料] 刪除了 {each}" for each in chunk))
+        return deleted
+
     def Update_Database(
             self, new_data:pd.DataFrame, existing_data:pd.DataFrame, 
             column_of_id:str, preserved_data:pd.DataFrame = None, 
-            effected_trigger:list[str]=[], edit_record:list[Edit_Record]=[]
+            effected_trigger:list[str]=[], edit_record:list[Edit_Record]=[],
+            update_method:str=UPDATE_STATEMENTS, insert_method:str=None
         ):
-        """ 從 dataframe 更新資料庫 """
+        """ 從 dataframe 更新資料庫, update_method 為 statements (逐筆 UPDATE 語句) 或 staging (暫存表批次更新), 兩者都以 ID 陣列批次刪除;
+            insert_method 為新增資料的方式 (executemany 或 copy, 預設 PostgreSQL 使用 copy) """
+
+        if update_method not in (UPDATE_STATEMENTS, UPDATE_STAGING):
+            raise ValueError(f"update_method 需要是 {UPDATE_STATEMENTS} 或 {UPDATE_STAGING}, 但提供 {update_method}")
 
         # 比較新舊 Data 的欄位, 如果有新增則加入, 如果有減少則刪除
         added_columns = list(set(new_data.columns.tolist()) - set(existing_data.columns.tolist()))
@@ -533,20 +751,31 @@ class SQL_Manager:
         # 比較差異
         added_ids, updated_ids, deleted_ids = self.Compare_Difference(new_data, existing_data, column_of_id, preserved_data)
 
-        # 生成更新語句
-        update_sql_statements = self.Generate_Update_SQL_Statements(updated_ids, existing_data, new_data, column_of_id, added_cols=added_columns, removed_cols=removed_columns)
-
-        # 生成刪除語句
-        delete_sql_statements = self.Generate_Delete_SQL_Statements(deleted_ids, column_of_id)
+        if update_method == UPDATE_STAGING:
+            # 暫存表批次更新和以 ID 陣列批次刪除在同一個交易中執行
+            staging = self._prepare_staging(updated_ids, existing_data, new_data, column_of_id, added_columns, removed_columns)
+            ids_to_delete = _unique_ids(deleted_ids)
+            if staging is not None or ids_to_delete:
+                with self._transaction(effected_trigger, "批次更新") as connection:
+                    updated = self._update_from_staging(connection, staging, column_of_id) if staging is not None else 0
+                    deleted = self._delete_by_ids(connection, ids_to_delete, column_of_id) if ids_to_delete else 0
+                print(f" --> [批次更新] 更新完成, 共更新 {updated} 行, 刪除 {deleted} 行")
+                self.log_record(f" --> [批次更新] 更新完成, 共更新 {updated} 行, 刪除 {deleted} 行")
+        else:
+            # 生成更新語句, 與以 ID 陣列批次刪除在同一個交易中執行
+            update_sql_statements = self.Generate_Update_SQL_Statements(updated_ids, existing_data, new_data, column_of_id, added_cols=added_columns, removed_cols=removed_columns)
+            ids_to_delete = _unique_ids(deleted_ids)
+            print(f" --> [執行查詢] 需要執行 {len(update_sql_statements)} 行, 刪除 {len(ids_to_delete)} 行")
+            with self._transaction(effected_trigger, "執行查詢") as connection:
+                for sql in update_sql_statements:
+                    connection.execute(text(sql))
+                deleted = self._delete_by_ids(connection, ids_to_delete, column_of_id) if ids_to_delete else 0
+            print(f" --> [執行查詢] 已成功執行完成, 共刪除 {deleted} 行")
 
-        # 綜合所有語句並執行
-        all_sql_statements = update_sql_statements + delete_sql_statements
-        self.Execute_SQL_Query(all_sql_statements, effected_trigger=effected_trigger)
-        
         # 插入新資料, 加入修改資訊
         for each in edit_record:
             new_data[each.column_name] = each.record
-        self.Insert_New_Data(added_ids, new_data, column_of_id, effected_trigger=effected_trigger)
+        self.Insert_New_Data(added_ids, new_data, column_of_id, effected_trigger=effected_trigger, method=insert_method)
 
         # 從 newData 中搜集新增的資料
         if self.new_data_added_excel != "":
@@ -565,6 +794,41 @@ class SQL_Manager:
         else:
             print("Log File: None")
 
+def _quote_identifier(name:str):
+    """ 加上雙引號的 SQL 識別字 (保留大小寫) """
+    return '"' + name.replace('"', '""') + '"'
+
+def _unique_ids(ids):
+    """ ID 轉成 string 並去除重複 (保留順序) """
+    return list(dict.fromkeys(str(each) for each in ids))
+
+def _stringify_columns(frame:pd.DataFrame, columns:list[str]):
+    """ 依照 columns 的順序將每一欄轉成 string (與 astype(str) 相同), 缺少的欄位填入 NaN """
+    return pd.DataFrame(
+        {column: frame[column].astype(str).astype(object) if column in frame.columns else np.full(len(frame), np.nan, dtype=object) for column in columns},
+        index=frame.index, columns=columns,
+    )
+
+def _aligned_string_values(frame:pd.DataFrame, column_of_id:str, target_ids:list[str], columns:list[str]):
+    """ 依照 target_ids (str) 的順序取出每個 ID 第一筆資料的 columns, 轉成 str 並去除前後空白; 沒有的欄位為 "" """
+    keys = frame[column_of_id].map(str)
+    first_rows = np.flatnonzero(~keys.duplicated().to_numpy())
+    positions = pd.Index(keys.to_numpy()[first_rows]).get_indexer(target_ids)
+    if (positions < 0).any():
+        missing = [target_ids[i] for i in np.flatnonzero(positions < 0)]
+        raise ValueError(f"{len(missing)} 個 ID 不在資料中: {missing[:10]}")
+
+    values = np.full((len(target_ids), len(columns)), "", dtype=object)
+    if len(target_ids) == 0:
+        return values
+    rows = first_rows[positions]
+    for index, column in enumerate(columns):
+        if column not in frame.columns:
+            continue
+        # 逐欄從 Series.values 取值, 與原本 str(...values[0]) 的字串格式相同 (例如 datetime64 為 '2024-01-02T00:00:00.000000000')
+        values[:, index] = [str(value).strip() for value in frame[column].values[rows]]
+    return values
+
 if __name__ == "__main__":
 
     # 印出 SQL_Manager 的說明文件
@@ -0,0 +1,44 @@
+import importlib
+import threading
+
+class _Lazy_Module:
+    """ 第一次存取屬性時才 import 的模組, 讓只用到 GCS 的任務不必載入 pandas / SQLAlchemy 等套件 """
+
+    def __init__(self, name: str):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            with self.__dict__["_lock"]:
+                module = self.__dict__["_module"]
+                if module is None:
+                    module = importlib.import_module(self.__dict__["_name"])
+                    self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr: str, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_module"] is not None else "not loaded"
+        return f"<lazy module '{self.__dict__['_name']}' ({state})>"
+
+def lazy_module(name: str):
+    """ 延遲 import 模組, 例如 pd = lazy_module("pandas") """
+    return _Lazy_Module(name)
+
+def lazy_function(module_name: str, function_name: str):
+    """ 延遲 import 模組中的函式, 例如 text = lazy_function("sqlalchemy", "text") """
+    module = _Lazy_Module(module_name)
+    def function(*args, **kwargs):
+        return getattr(module, function_name)(*args, **kwargs)
+    function.__name__ = function_name
+    function.__qualname__ = function_name
+    function.__doc__ = f"延遲 import 的 {module_name}.{function_name}"
+    return function
@@ -0,0 +1,171 @@
+"""
+    以本地的假 GCS (Local_Storage_Backend) 量測 GCS_Manager / CRL_Manager 的傳輸效能, 不需要真正的 bucket
+
+    Usage:
+        python benchmarks/bench_transfer.py                                   # 預設所有 profile
+        python benchmarks/bench_transfer.py --profiles many-small mixed --latency 0.02 --bandwidth 50
+        python benchmarks/bench_transfer.py --json result.json                # 儲存結果
+        python benchmarks/bench_transfer.py --baseline result.json --tolerance 0.2   # 比上次慢超過 20% 時 exit code 為 1
+
+    ＊ latency 為每個 request 的延遲 (秒), bandwidth 為每個 request 的速度上限 (MiB/秒)
+    ＊ 每個 profile 量測: upload_folder, list, download_folder, sync_up (沒有變動), process_data (CRL_Manager 下載 -> cp -> 上傳),
+      delete_remote_folder
+"""
+
+from contextlib import redirect_stdout
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from GCP_Manager.GCS_Manager import GCS_Manager, set_storage_backend # noqa: E402
+from GCP_Manager.CRL_Manager import CRL_Manager # noqa: E402
+from GCP_Manager.Local_Storage_Backend import Local_Storage_Backend # noqa: E402
+
+KiB = 1024
+MiB = 1024 * KiB
+BUCKET = "bench"
+
+# profile: 檔案數量和大小 (固定大小或 (最小, 最大) 之間的 log-uniform 分布)
+PROFILES = {
+    "many-small": {"files": 1000, "size": 16 * KiB},
+    "medium": {"files": 100, "size": 1 * MiB},
+    "few-large": {"files": 4, "size": 64 * MiB},
+    "mixed": {"files": 200, "size": (1 * KiB, 8 * MiB)},
+}
+
+CLI_SCRIPT = "#!/bin/bash\nmkdir -p output && cp -r input/. output/\n"
+
+def generate_files(folder, profile, seed):
+    """ 產生 profile 的測試檔案, 回傳總 bytes """
+    rng = random.Random(seed)
+    total = 0
+    for i in range(profile["files"]):
+        size = profile["size"]
+        if isinstance(size, tuple):
+            low, high = size
+            size = int(low * (high / low) ** rng.random())
+        path = os.path.join(folder, f"dir{i % 10}", f"file{i:05d}.bin")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(os.urandom(size))
+        total += size
+    return total
+
+def timed(backend, operation):
+    """ 執行 operation, 回傳 (秒數, request 數量) """
+    requests_before = backend.stats()["requests"]
+    start_time = time.monotonic()
+    operation()
+    return time.monotonic() - start_time, backend.stats()["requests"] - requests_before
+
+def bench_profile(name, profile, work_dir, backend, args):
+    """ 量測一個 profile, 回傳 {操作: {seconds, requests, files_per_s, mib_per_s}} """
+    source = os.path.join(work_dir, "source")
+    total_bytes = generate_files(source, profile, args.seed)
+    n_files = profile["files"]
+    manager = GCS_Manager(BUCKET, max_workers=args.workers)
+    remote_input = f"{name}/input"
+    remote_output = f"{name}/output"
+
+    job_config = json.dumps({
+        "inputs": [{"gcs_bucket": BUCKET, "gcs_path": remote_input, "local_path": "input", "file_type": "folder", "transfer_method": "python"}],
+        "outputs": [{"gcs_bucket": BUCKET, "gcs_path": remote_output, "local_path": "output", "file_type": "folder", "transfer_method": "python"}],
+        "cli_params": [],
+    })
+
+    def process_data():
+        crl_manager = CRL_Manager(job_config, CLI_SCRIPT, work_dir=os.path.join(work_dir, "crl"), transfer_workers=args.workers)
+        if not crl_manager.process_data():
+            raise RuntimeError("process_data 失敗")
+
+    operations = [
+        ("upload_folder", lambda: manager.upload_folder(source, remote_input), 1),
+        ("list", lambda: list(manager.iter_blobs(remote_input)), 1),
+        ("download_folder", lambda: manager.download_folder(remote_input, os.path.join(work_dir, "download")), 1),
+        ("sync_up", lambda: manager.sync_up(source, remote_input), 1),
+        # process_data 下載一次、上傳一次
+        ("process_data", process_data, 2),
+        ("delete_remote_folder", lambda: (manager.delete_remote_folder(remote_input), manager.delete_remote_folder(remote_output)), 2),
+    ]
+
+    results = {}
+    for operation_name, operation, passes in operations:
+        seconds, requests = timed(backend, operation)
+        moved = total_bytes * passes if operation_name in ("upload_folder", "download_folder", "process_data") else 0
+        results[operation_name] = {
+            "seconds": seconds,
+            "requests": requests,
+            "files_per_s": n_files * passes / seconds if seconds > 0 else None,
+            "mib_per_s": moved / MiB / seconds if seconds > 0 and moved else None,
+        }
+    return {"files": n_files, "bytes": total_bytes, "operations": results}
+
+def compare(results, baseline, tolerance):
+    """ 與 baseline 比較, 回傳變慢的項目 """
+    regressions = []
+    for name, result in results["profiles"].items():
+        for operation_name, current in result["operations"].items():
+            previous = baseline.get("profiles", {}).get(name, {}).get("operations", {}).get(operation_name)
+            if previous and current["seconds"] > previous["seconds"] * (1 + tolerance):
+                regressions.append((name, operation_name, previous["seconds"], current["seconds"]))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="以本地的假 GCS 量測 GCS_Manager / CRL_Manager 的傳輸效能")
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=list(PROFILES), help="要量測的 profile")
+    parser.add_argument("--latency", type=float, default=0.02, help="每個 request 的延遲 (秒)")
+    parser.add_argument("--bandwidth", type=float, default=100.0, help="每個 request 的速度上限 (MiB/秒), 0 為不限制")
+    parser.add_argument("--workers", type=int, default=16, help="平行傳輸的 thread 數量")
+    parser.add_argument("--seed", type=int, default=0, help="產生檔案大小的亂數種子")
+    parser.add_argument("--root", default=None, help="暫存資料夾 (預設為系統暫存資料夾)")
+    parser.add_argument("--json", default=None, help="將結果輸出成 JSON 檔案")
+    parser.add_argument("--baseline", default=None, help="與之前的 JSON 結果比較")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="比 baseline 慢多少 (比例) 視為退步")
+    parser.add_argument("--verbose", action="store_true", help="顯示 GCS_Manager 的輸出")
+    args = parser.parse_args()
+
+    root = args.root or tempfile.mkdtemp(prefix="gcp_manager_bench_")
+    results = {"latency": args.latency, "bandwidth_mib": args.bandwidth, "workers": args.workers, "profiles": {}}
+    try:
+        for name in args.profiles:
+            profile_dir = os.path.join(root, name)
+            backend = Local_Storage_Backend(os.path.join(profile_dir, "gcs"), latency=args.latency, bandwidth=args.bandwidth * MiB if args.bandwidth else None)
+            set_storage_backend(backend)
+            try:
+                with open(os.devnull, 'w') as devnull, redirect_stdout(sys.stdout if args.verbose else devnull):
+                    result = bench_profile(name, PROFILES[name], profile_dir, backend, args)
+            finally:
+                set_storage_backend(None)
+                shutil.rmtree(profile_dir, ignore_errors=True)
+            results["profiles"][name] = result
+
+            print(f" --> {name}: {result['files']} 個檔案, {result['bytes'] / MiB:.1f} MiB")
+            for operation_name, operation in result["operations"].items():
+                throughput = f", {operation['mib_per_s']:.1f} MiB/s" if operation["mib_per_s"] else ""
+                print(f"       {operation_name:<22}{operation['seconds']:8.2f} 秒, {operation['requests']:6d} requests, {operation['files_per_s']:8.1f} files/s{throughput}")
+    finally:
+        if args.root is None:
+            shutil.rmtree(root, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for name, operation_name, previous, current in regressions:
+            print(f" --> [退步] {name} {operation_name}: {previous:.2f} 秒 -> {current:.2f} 秒")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
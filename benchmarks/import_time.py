@@ -0,0 +1,108 @@
+"""
+    量測 GCP_Manager 各模組的 import 時間 (python -X importtime)
+
+    Usage:
+        python benchmarks/import_time.py                      # 量測所有模組
+        python benchmarks/import_time.py --modules GCP_Manager.CRL_Manager --repeat 10 --top 15
+        python benchmarks/import_time.py --json import_time.json
+
+    ＊ 每個模組在新的 python process 中 import, 重複 repeat 次取中位數
+    ＊ 同時列出 import 時載入了哪些重量級套件 (pandas, SQLAlchemy, google-cloud-storage ...),
+      只用到 GCS 的任務不應該載入 pandas 或 SQL 相關套件
+"""
+
+from statistics import median
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    "GCP_Manager.GCS_Manager",
+    "GCP_Manager.AsyncGCS_Manager",
+    "GCP_Manager.Cache_Manager",
+    "GCP_Manager.Metrics_Manager",
+    "GCP_Manager.Checkpoint_Manager",
+    "GCP_Manager.CRL_Manager",
+    "GCP_Manager.Batch_Manager",
+    "GCP_Manager.SQL_Manager",
+]
+
+# import 時不應該被載入的重量級套件
+HEAVY_PACKAGES = [
+    "pandas",
+    "numpy",
+    "sqlalchemy",
+    "pg8000",
+    "google.cloud.storage",
+    "google.cloud.sql.connector",
+    "google.api_core",
+    "requests",
+]
+
+def measure_once(module):
+    """ 在新的 process 中 import 模組, 回傳 (累計 import 時間 us, 每個套件的累計時間) """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, capture_output=True, text=True,
+    )
+    if process.returncode != 0:
+        last_line = process.stderr.strip().splitlines()[-1] if process.stderr.strip() else ""
+        raise RuntimeError(f"import {module} 失敗: {last_line}")
+
+    cumulative = {}
+    for line in process.stderr.splitlines():
+        # import time:       self [us] |  cumulative | imported package
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        try:
+            cumulative[name.strip()] = int(cumulative_us)
+        except ValueError:
+            continue
+    return cumulative.get(module, 0), cumulative
+
+def measure(module, repeat):
+    totals = []
+    packages = {}
+    for _ in range(repeat):
+        total, cumulative = measure_once(module)
+        totals.append(total)
+        packages = cumulative
+    heavy = [package for package in HEAVY_PACKAGES if package in packages]
+    top = sorted(
+        ((name, us) for name, us in packages.items() if name != module and not name.startswith("GCP_Manager")),
+        key=lambda item: item[1], reverse=True,
+    )
+    return {"module": module, "median_ms": median(totals) / 1000, "min_ms": min(totals) / 1000, "heavy_packages": heavy, "top_imports": top}
+
+def main():
+    parser = argparse.ArgumentParser(description="量測 GCP_Manager 各模組的 import 時間")
+    parser.add_argument("--modules", nargs="+", default=MODULES, help="要量測的模組")
+    parser.add_argument("--repeat", type=int, default=5, help="每個模組重複次數")
+    parser.add_argument("--top", type=int, default=5, help="列出最慢的前幾個 import")
+    parser.add_argument("--json", default=None, help="將結果輸出成 JSON 檔案")
+    args = parser.parse_args()
+
+    results = []
+    for module in args.modules:
+        try:
+            result = measure(module, args.repeat)
+        except RuntimeError as e:
+            print(f" --> {e}")
+            continue
+        results.append(result)
+        heavy = ", ".join(result["heavy_packages"]) or "無"
+        print(f" --> {module}: 中位數 {result['median_ms']:.1f} ms (最快 {result['min_ms']:.1f} ms), 載入的重量級套件: {heavy}")
+        for name, us in result["top_imports"][:args.top]:
+            print(f"       {us / 1000:8.1f} ms  {name}")
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()